@@ -0,0 +1,226 @@
+"""Speed and accuracy of every detector on degraded synthetic sheets.
+
+Renders sheets with known answers, degrades them (noise, rotation, blur) and
+runs each through the full ``grade_sheet`` pipeline and the individual
+detectors. Prints a table to stderr and writes the results as JSON. With
+``--baseline`` the run is compared against an earlier JSON report and exits
+non-zero when accuracy drops or p95 latency grows beyond the tolerances.
+
+Usage::
+
+    python -m benchmarks.accuracy --output report.json
+    python -m benchmarks.accuracy --questions 100 --noise 0 15 --baseline report.json
+"""
+import argparse
+import io
+import itertools
+import json
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from ocr_app.grading import (
+    detect_answers_from_bubbles,
+    detect_answers_from_template,
+    grade_sheet,
+    ocr_answers,
+)
+from ocr_app.ocr import PytesseractBackend, get_backend
+
+from .synthetic import degrade, random_answers, render_sheet
+
+
+def _ocr_available() -> bool:
+    try:
+        backend = get_backend()
+        if isinstance(backend, PytesseractBackend):
+            import pytesseract
+
+            pytesseract.get_tesseract_version()
+    except Exception:
+        return False
+    return True
+
+
+def _detectors(n: int) -> Dict[str, Callable[[Image.Image, bytes, List[str]], Dict]]:
+    detectors = {
+        # decode, preprocessing, detection cascade and compare_answers
+        "pipeline": lambda img, data, truth: grade_sheet(data, truth, n)["answers"],
+        "template": lambda img, data, truth: detect_answers_from_template(img, n)[0],
+        "contour": lambda img, data, truth: detect_answers_from_bubbles(img, n)[0],
+    }
+    if _ocr_available():
+        detectors["ocr"] = lambda img, data, truth: ocr_answers(img, n)[0]
+    return detectors
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    return float(np.percentile(values, pct)) if values else 0.0
+
+
+def run_scenario(
+    questions: int,
+    dpi: int,
+    noise: float,
+    rotation: float,
+    blur: float,
+    sheets: int,
+    blank_rate: float,
+    only: List[str] | None = None,
+) -> List[Dict[str, Any]]:
+    """Grade ``sheets`` degraded sheets with each detector and summarise."""
+    samples = []
+    for i in range(sheets):
+        truth = random_answers(questions, seed=i, blank_rate=blank_rate)
+        img = degrade(render_sheet(truth, dpi), noise, rotation, blur, seed=i)
+        buf = io.BytesIO()
+        img.save(buf, "JPEG", quality=90)
+        samples.append((truth, img, buf.getvalue()))
+
+    rows = []
+    for name, detect in _detectors(questions).items():
+        if only and name not in only:
+            continue
+        latencies: List[float] = []
+        correct = exact = 0
+        for truth, img, data in samples:
+            start = time.perf_counter()
+            answers = detect(img, data, truth)
+            latencies.append(time.perf_counter() - start)
+            hits = sum(answers.get(q + 1) == (a or None) for q, a in enumerate(truth))
+            correct += hits
+            exact += hits == questions
+        # separate run: tracemalloc slows allocation heavy code down
+        truth, img, data = samples[0]
+        tracemalloc.start()
+        detect(img, data, truth)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        rows.append(
+            {
+                "questions": questions,
+                "dpi": dpi,
+                "noise": noise,
+                "rotation": rotation,
+                "blur": blur,
+                "detector": name,
+                "sheets": sheets,
+                "accuracy": correct / (questions * sheets),
+                "exact_sheets": exact / sheets,
+                "sheets_per_sec": sheets / sum(latencies),
+                "p50_ms": _percentile(latencies, 50) * 1000,
+                "p95_ms": _percentile(latencies, 95) * 1000,
+                "mean_ms": statistics.mean(latencies) * 1000,
+                "peak_mb": peak / 1e6,
+            }
+        )
+    return rows
+
+
+def compare(
+    report: Dict[str, Any],
+    baseline: Dict[str, Any],
+    accuracy_drop: float,
+    latency_growth: float,
+) -> List[str]:
+    """Return a message for every scenario that regressed against ``baseline``."""
+    fields = ("questions", "dpi", "noise", "rotation", "blur", "detector")
+    old = {tuple(r[f] for f in fields): r for r in baseline["results"]}
+    problems = []
+    for row in report["results"]:
+        before = old.get(tuple(row[f] for f in fields))
+        if before is None:
+            continue
+        label = " ".join(f"{f}={row[f]}" for f in fields)
+        if row["accuracy"] < before["accuracy"] - accuracy_drop:
+            problems.append(
+                f"{label}: accuracy {before['accuracy']:.1%} -> {row['accuracy']:.1%}"
+            )
+        if row["p95_ms"] > before["p95_ms"] * (1 + latency_growth):
+            problems.append(
+                f"{label}: p95 {before['p95_ms']:.1f}ms -> {row['p95_ms']:.1f}ms"
+            )
+    return problems
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--questions", type=int, nargs="+", default=[20, 50, 100])
+    parser.add_argument("--dpi", type=int, nargs="+", default=[150, 300])
+    parser.add_argument("--noise", type=float, nargs="+", default=[0, 12])
+    parser.add_argument("--rotation", type=float, nargs="+", default=[0, 1.5])
+    parser.add_argument("--blur", type=float, nargs="+", default=[0, 1.0])
+    parser.add_argument("--sheets", type=int, default=3, help="sheets per scenario")
+    parser.add_argument("--blank-rate", type=float, default=0.05)
+    parser.add_argument(
+        "--detectors",
+        nargs="+",
+        choices=["pipeline", "template", "contour", "ocr"],
+        help="detectors to run (default: all available)",
+    )
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--baseline", help="earlier JSON report to compare against")
+    parser.add_argument("--max-accuracy-drop", type=float, default=0.01)
+    parser.add_argument("--max-latency-growth", type=float, default=0.25)
+    args = parser.parse_args()
+
+    results: List[Dict[str, Any]] = []
+    header = (
+        f"{'q':>3} {'dpi':>4} {'noise':>5} {'rot':>4} {'blur':>4} {'detector':>9} "
+        f"{'acc':>6} {'sheets/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'peak MB':>8}"
+    )
+    print(header, file=sys.stderr)
+    for questions, dpi, noise, rotation, blur in itertools.product(
+        args.questions, args.dpi, args.noise, args.rotation, args.blur
+    ):
+        for row in run_scenario(
+            questions, dpi, noise, rotation, blur, args.sheets, args.blank_rate,
+            args.detectors,
+        ):
+            results.append(row)
+            print(
+                f"{questions:>3} {dpi:>4} {noise:>5g} {rotation:>4g} {blur:>4g} "
+                f"{row['detector']:>9} {row['accuracy']:>6.1%} "
+                f"{row['sheets_per_sec']:>8.1f} {row['p50_ms']:>8.1f} "
+                f"{row['p95_ms']:>8.1f} {row['peak_mb']:>8.1f}",
+                file=sys.stderr,
+            )
+
+    report = {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "opencv": cv2.__version__,
+            "numpy": np.__version__,
+            "args": vars(args),
+        },
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            problems = compare(
+                report, json.load(f), args.max_accuracy_drop, args.max_latency_growth
+            )
+        for problem in problems:
+            print(f"REGRESSION {problem}", file=sys.stderr)
+        if problems:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
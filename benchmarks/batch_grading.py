@@ -0,0 +1,50 @@
+"""Measure batch grading throughput for different pool sizes.
+
+Usage::
+
+    python -m benchmarks.batch_grading --sheets 40 --workers 1 2 4
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from ocr_app.grading import get_pool, grade_batch
+
+from .synthetic import random_answers, render_sheet
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sheets", type=int, default=40)
+    parser.add_argument("--questions", type=int, default=50)
+    parser.add_argument("--dpi", type=int, default=150)
+    parser.add_argument(
+        "--workers", type=int, nargs="+", default=[1, 2, os.cpu_count() or 1]
+    )
+    args = parser.parse_args()
+
+    key = random_answers(args.questions, seed=0)
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for i in range(args.sheets):
+            path = os.path.join(tmp, f"sheet{i}.png")
+            render_sheet(random_answers(args.questions, seed=i), args.dpi).save(path)
+            paths.append(path)
+
+        print(f"{'workers':>7} {'total s':>8} {'sheets/s':>9} {'mean sheet s':>13}")
+        for workers in sorted(set(args.workers)):
+            if workers > 1:
+                # start the pool outside the timed region
+                get_pool(workers).submit(int).result()
+            start = time.perf_counter()
+            results = grade_batch(paths, key, args.questions, workers=workers)
+            total = time.perf_counter() - start
+            mean = sum(r["elapsed"] for r in results) / len(results)
+            print(
+                f"{workers:>7} {total:>8.2f} {len(paths) / total:>9.2f} {mean:>13.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
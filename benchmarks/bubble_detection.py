@@ -0,0 +1,49 @@
+"""Compare the contour and template bubble detectors at several resolutions.
+
+Usage::
+
+    python -m benchmarks.bubble_detection --questions 50 --dpi 100 150 200 300
+"""
+import argparse
+import statistics
+import time
+
+from ocr_app.grading import detect_answers_from_bubbles, detect_answers_from_template
+
+from .synthetic import random_answers, render_sheet
+
+
+def _time(func, repeat: int) -> tuple[float, dict]:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        answers = func()[0]
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), answers
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--questions", type=int, default=50)
+    parser.add_argument("--dpi", type=int, nargs="+", default=[100, 150, 200, 300])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    truth = random_answers(args.questions, seed=1)
+    print(f"{'dpi':>4} {'detector':>9} {'ms/sheet':>9} {'accuracy':>9}")
+    for dpi in args.dpi:
+        img = render_sheet(truth, dpi).convert("RGB")
+        for name, func in (
+            ("contour", lambda: detect_answers_from_bubbles(img, args.questions)),
+            ("template", lambda: detect_answers_from_template(img, args.questions)),
+        ):
+            seconds, answers = _time(func, args.repeat)
+            correct = sum(answers.get(i + 1) == a for i, a in enumerate(truth))
+            print(
+                f"{dpi:>4} {name:>9} {seconds * 1000:>9.1f} "
+                f"{correct / len(truth):>9.0%}"
+            )
+
+
+if __name__ == "__main__":
+    main()
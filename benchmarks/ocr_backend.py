@@ -0,0 +1,66 @@
+"""Per-call overhead and throughput of the available OCR backends.
+
+Usage::
+
+    python -m benchmarks.ocr_backend --calls 20
+"""
+import argparse
+import statistics
+import time
+
+from PIL import Image, ImageDraw
+
+from ocr_app.grading import OCR_CONFIG, parse_ocr_data
+from ocr_app.ocr import BACKENDS, get_backend
+
+from .synthetic import random_answers
+
+
+def _text_sheet(answers: list, dpi: int = 150) -> Image.Image:
+    """A sheet with ``<number> <letter>`` lines, the layout OCR falls back to."""
+    line_h = dpi // 4
+    img = Image.new("L", (dpi * 3, line_h * (len(answers) + 2)), 255)
+    draw = ImageDraw.Draw(img)
+    for i, ans in enumerate(answers, start=1):
+        draw.text((dpi // 2, line_h * i), f"{i} {ans}", fill=0)
+    return img
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=20)
+    parser.add_argument("--questions", type=int, default=50)
+    args = parser.parse_args()
+
+    truth = random_answers(args.questions, seed=4)
+    sheet = _text_sheet(truth)
+    tiny = Image.new("L", (32, 32), 255)
+    print(f"{'backend':>12} {'overhead ms':>12} {'sheet ms':>9} {'sheets/s':>9} {'accuracy':>9}")
+    for name in BACKENDS:
+        try:
+            backend = get_backend(name)
+            backend.image_to_data(tiny, OCR_CONFIG)  # warm up
+        except Exception as exc:
+            print(f"{name:>12} unavailable: {exc}")
+            continue
+        overhead = []
+        for _ in range(args.calls):
+            start = time.perf_counter()
+            backend.image_to_data(tiny, OCR_CONFIG)
+            overhead.append(time.perf_counter() - start)
+        per_sheet = []
+        for _ in range(args.calls):
+            start = time.perf_counter()
+            data_dict = backend.image_to_data(sheet, OCR_CONFIG)
+            per_sheet.append(time.perf_counter() - start)
+        answers, _ = parse_ocr_data(data_dict, sheet.size, args.questions)
+        correct = sum(answers.get(i + 1) == a for i, a in enumerate(truth))
+        sheet_s = statistics.median(per_sheet)
+        print(
+            f"{name:>12} {statistics.median(overhead) * 1000:>12.1f} "
+            f"{sheet_s * 1000:>9.1f} {1 / sheet_s:>9.1f} {correct / len(truth):>9.0%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Latency and peak memory of detection with and without preprocessing.
+
+Usage::
+
+    python -m benchmarks.preprocessing --dpi 300 600
+"""
+import argparse
+import io
+import time
+import tracemalloc
+
+from PIL import Image
+
+from ocr_app.grading import detect_answers_from_template
+from ocr_app.preprocess import load_sheet
+
+from .synthetic import random_answers, render_sheet
+
+
+def _full(data: bytes, n: int) -> dict:
+    return detect_answers_from_template(Image.open(io.BytesIO(data)), n)[0]
+
+
+def _prepared(data: bytes, n: int) -> dict:
+    return detect_answers_from_template(load_sheet(io.BytesIO(data)).image, n)[0]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--questions", type=int, default=50)
+    parser.add_argument("--dpi", type=int, nargs="+", default=[300, 600])
+    args = parser.parse_args()
+
+    truth = random_answers(args.questions, seed=3)
+    print(f"{'dpi':>4} {'MP':>5} {'path':>9} {'ms':>8} {'peak MB':>8} {'accuracy':>9}")
+    for dpi in args.dpi:
+        img = render_sheet(truth, dpi)
+        buf = io.BytesIO()
+        img.save(buf, "JPEG", quality=90)
+        data = buf.getvalue()
+        megapixels = img.width * img.height / 1e6
+        for name, func in (("full", _full), ("prepared", _prepared)):
+            tracemalloc.start()
+            start = time.perf_counter()
+            answers = func(data, args.questions)
+            elapsed = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            correct = sum(answers.get(i + 1) == a for i, a in enumerate(truth))
+            print(
+                f"{dpi:>4} {megapixels:>5.1f} {name:>9} {elapsed * 1000:>8.1f} "
+                f"{peak / 1e6:>8.1f} {correct / len(truth):>9.0%}"
+            )
+
+
+if __name__ == "__main__":
+    main()
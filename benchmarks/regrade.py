@@ -0,0 +1,44 @@
+"""Time re-grading stored answers against a corrected key.
+
+Usage::
+
+    python -m benchmarks.regrade --students 10000 --questions 100
+"""
+import argparse
+import random
+import time
+
+from ocr_app.grading import compare_answers, regrade_scores
+
+from .synthetic import random_answers
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--students", type=int, default=10000)
+    parser.add_argument("--questions", type=int, default=100)
+    args = parser.parse_args()
+
+    rng = random.Random(5)
+    key = random_answers(args.questions, seed=5)
+    stored = ["".join(rng.choice("ABCDE-") for _ in key) for _ in range(args.students)]
+
+    start = time.perf_counter()
+    scores = regrade_scores(key, stored)
+    vectorized = time.perf_counter() - start
+
+    start = time.perf_counter()
+    loop = [
+        sum(compare_answers(key, {i + 1: a for i, a in enumerate(s) if a != "-"}).values())
+        for s in stored
+    ]
+    per_sheet = time.perf_counter() - start
+
+    assert list(scores) == loop
+    print(f"{args.students} results x {args.questions} questions")
+    print(f"  regrade_scores:  {vectorized * 1000:8.1f} ms")
+    print(f"  compare_answers: {per_sheet * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Measure start-up time and memory of a fresh app process.
+
+Every scenario runs in a new interpreter, like a server worker starting,
+and reports the wall time of the measured step, the peak RSS of the process
+(read from ``/proc``, so Linux only) and which heavy libraries ended up
+imported. ``first sheet`` is the time to grade one synthetic sheet right
+after ``create_app``, which is what the first request of a worker forked
+from that process pays.
+
+Usage::
+
+    python -m benchmarks.startup --repeat 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from .synthetic import random_answers, render_sheet
+
+HEAVY = ("cv2", "numpy", "PIL", "pytesseract")
+
+CHILD = """
+import json, sys, time
+
+
+def peak_rss():
+    # VmHWM starts over at exec, unlike ru_maxrss which keeps the parent's peak
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) * 1024
+
+
+raw = open(sys.argv[1], "rb").read()
+{setup}
+start = time.perf_counter()
+{measure}
+measured = time.perf_counter() - start
+print(json.dumps({{
+    "seconds": measured,
+    "rss": peak_rss(),
+    "loaded": [m for m in {heavy!r} if m in sys.modules],
+}}))
+"""
+
+CREATE_APP = "from ocr_app.app import create_app\ncreate_app()"
+FIRST_SHEET = (
+    "from ocr_app.grading import grade_sheet\n"
+    "grade_sheet(raw, [], 50, {'cache_dir': None})"
+)
+
+# name, untimed set-up code, timed code, whether OCR_WARM_UP is set
+SCENARIOS = [
+    ("import ocr_app.app", "", "import ocr_app.app", False),
+    ("create_app", "", CREATE_APP, False),
+    ("create_app + warm-up", "", CREATE_APP, True),
+    ("first sheet", CREATE_APP, FIRST_SHEET, False),
+    ("first sheet, warmed", CREATE_APP, FIRST_SHEET, True),
+]
+
+
+def run(setup: str, measure: str, warm_up: bool, sheet: str) -> dict:
+    env = dict(os.environ, OCR_WARM_UP="1" if warm_up else "0")
+    code = CHILD.format(setup=setup or "pass", measure=measure, heavy=HEAVY)
+    out = subprocess.run(
+        [sys.executable, "-c", code, sheet],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(out.stdout.splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sheet = os.path.join(tmp, "sheet.png")
+        render_sheet(random_answers(50, seed=0)).save(sheet)
+        print(f"{'scenario':<22} {'ms':>8} {'peak RSS MB':>12}  heavy modules loaded")
+        for name, setup, measure, warm_up in SCENARIOS:
+            runs = [run(setup, measure, warm_up, sheet) for _ in range(args.repeat)]
+            ms = statistics.median(r["seconds"] for r in runs) * 1000
+            rss = statistics.median(r["rss"] for r in runs) / 1e6
+            loaded = ", ".join(runs[-1]["loaded"]) or "-"
+            print(f"{name:<22} {ms:8.1f} {rss:12.1f}  {loaded}")
+
+
+if __name__ == "__main__":
+    main()
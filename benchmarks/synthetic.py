@@ -0,0 +1,105 @@
+"""Render synthetic answer sheets resembling ``answer_sheet.tex``."""
+import random
+from typing import List, Optional
+
+import cv2
+import numpy as np
+from PIL import Image
+
+OPTIONS = "ABCDE"
+
+
+def random_answers(
+    num_questions: int, seed: Optional[int] = None, blank_rate: float = 0.0
+) -> List[str]:
+    """Pick a random answer per question; ``""`` marks a question left blank."""
+    rng = random.Random(seed)
+    return [
+        "" if blank_rate and rng.random() < blank_rate else rng.choice(OPTIONS)
+        for _ in range(num_questions)
+    ]
+
+
+def render_sheet(
+    answers: List[str], dpi: int = 150, code: str = "000000", marks: bool = True
+) -> Image.Image:
+    """Draw a letter-sized sheet with one filled bubble per answered row.
+
+    The geometry follows the LaTeX template: 1in margins, a student code grid
+    with one row per digit of ``code`` and a column per value 0-9, a centred
+    table with a question number column followed by five ``\\bigcirc``
+    columns and, unless ``marks`` is false, a 0.3in registration square 0.5in
+    from every corner. Long tables extend the page instead of shrinking the
+    rows.
+    """
+    unit = dpi / 72.0  # pixels per point
+    radius = int(7 * unit)
+    row_h = int(18 * unit)
+    col_w = int(30 * unit)
+    width = int(8.5 * dpi)
+    code_h = row_h * (len(code) + 1)
+    height = max(int(11 * dpi), int(dpi * 3.6) + code_h + row_h * (len(answers) + 1))
+    page = np.full((height, width), 255, dtype=np.uint8)
+    if marks:
+        inset, side = int(0.5 * dpi), int(0.3 * dpi)
+        for x in (inset, width - inset - side):
+            for y in (inset, height - inset - side):
+                page[y:y + side, x:x + side] = 0
+    font = cv2.FONT_HERSHEY_SIMPLEX
+    cv2.putText(page, "Answer Sheet", (int(width * 0.35), int(dpi * 1.2)),
+                font, dpi / 90.0, 0, max(1, dpi // 75))
+    cv2.putText(page, f"Student Code: {code}", (int(width * 0.36), int(dpi * 1.6)),
+                font, dpi / 150.0, 0, max(1, dpi // 100))
+
+    y = int(dpi * 2.0)
+    gx0 = width // 2 - 5 * col_w
+    for value in range(10):
+        cv2.putText(page, str(value), (gx0 + value * col_w + col_w // 2 - radius // 2, y),
+                    font, dpi / 200.0, 0, max(1, dpi // 100))
+    for digit in code:
+        y += row_h
+        for value in range(10):
+            center = (gx0 + value * col_w + col_w // 2, y)
+            thickness = -1 if str(value) == digit else max(1, dpi // 100)
+            cv2.circle(page, center, radius, 0, thickness)
+
+    y = int(dpi * 2.6) + code_h
+    x0 = width // 2 - int(2.5 * col_w)
+    for col, letter in enumerate(OPTIONS):
+        cv2.putText(page, letter, (x0 + col * col_w + col_w // 2 - radius // 2, y),
+                    font, dpi / 200.0, 0, max(1, dpi // 100))
+    y += row_h
+    for i, ans in enumerate(answers, start=1):
+        cv2.putText(page, str(i), (x0 - col_w, y + radius // 2), font,
+                    dpi / 200.0, 0, max(1, dpi // 100))
+        for col, letter in enumerate(OPTIONS):
+            center = (x0 + col * col_w + col_w // 2, y)
+            thickness = -1 if letter == ans else max(1, dpi // 100)
+            cv2.circle(page, center, radius, 0, thickness)
+        y += row_h
+    return Image.fromarray(cv2.cvtColor(page, cv2.COLOR_GRAY2RGB))
+
+
+def degrade(
+    img: Image.Image,
+    noise: float = 0.0,
+    rotation: float = 0.0,
+    blur: float = 0.0,
+    seed: Optional[int] = None,
+) -> Image.Image:
+    """Simulate a phone photo or cheap scan of a rendered sheet.
+
+    ``rotation`` is in degrees, ``blur`` the Gaussian sigma in pixels and
+    ``noise`` the standard deviation of added grey level noise.
+    """
+    page = np.asarray(img.convert("L"))
+    if rotation:
+        h, w = page.shape
+        matrix = cv2.getRotationMatrix2D((w / 2, h / 2), rotation, 1.0)
+        page = cv2.warpAffine(page, matrix, (w, h), borderValue=255)
+    if blur:
+        page = cv2.GaussianBlur(page, (0, 0), blur)
+    if noise:
+        rng = np.random.default_rng(seed)
+        page = np.clip(page + rng.normal(0, noise, page.shape), 0, 255).astype(np.uint8)
+    return Image.fromarray(cv2.cvtColor(page, cv2.COLOR_GRAY2RGB))
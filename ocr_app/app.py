@@ -1,29 +1,73 @@
+import cProfile
+import hmac
+import io
 import os
-import re
-import uuid
+import tempfile
+import threading
+import time
 import subprocess
-from typing import Dict, List, Any
+import zipfile
+from typing import Any, Dict, Iterable, Iterator, List, Mapping
 
 from flask import (
     Flask,
+    Response,
+    before_render_template,
+    current_app,
+    g,
     render_template,
     request,
     redirect,
     url_for,
     flash,
     send_file,
+    send_from_directory,
     session,
+    jsonify,
+    abort,
+    get_flashed_messages,
+    stream_template,
+    template_rendered,
 )
 from werkzeug.utils import secure_filename
 
-import pytesseract
-from PIL import Image
-import cv2
-import numpy as np
+from . import data, export, sheets
+from .ingest import (
+    CONTAINER_EXTENSIONS,
+    IMAGE_EXTENSIONS,
+    MAX_SHEET_BYTES,
+    Sheets,
+    expand,
+    extension,
+)
+from .jobs import Job, JobQueue
+from .live import MAX_FRAME_BYTES, LiveSession, LiveSessions
+from .metrics import record_sheet, registry
+from .uploads import HASH_NAME, PREVIEW_SIZES, UploadStore
+
+ALLOWED_EXTENSIONS = IMAGE_EXTENSIONS | CONTAINER_EXTENSIONS
+
+# grading names importable from here for existing imports; the grading engine
+# (OpenCV, NumPy, tesseract) is only imported when one of them is first used
+_GRADING_EXPORTS = {
+    "CODE_DIGITS",
+    "compare_answers",
+    "detect_answers_from_bubbles",
+    "encode_answers",
+    "get_pool",
+    "grade_batch",
+    "grade_sheet",
+    "parse_answers_from_text",
+    "regrade_scores",
+}
 
-from . import data
 
-ALLOWED_EXTENSIONS = {"png", "jpg", "jpeg"}
+def __getattr__(name: str) -> Any:
+    if name in _GRADING_EXPORTS:
+        from . import grading
+
+        return getattr(grading, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def login_required(func):
@@ -39,132 +83,182 @@ def login_required(func):
     return wrapper
 
 
+def api_login_required(func):
+    """Allow a logged in session or ``Authorization: Bearer <API_TOKEN>``.
+
+    Unlike ``login_required`` failures are answered with a JSON 401 so
+    scanner integrations never get redirected to the login form.
+    """
+    from functools import wraps
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        token = current_app.config.get("API_TOKEN")
+        auth = request.headers.get("Authorization", "")
+        if not session.get("logged_in") and not (
+            token and hmac.compare_digest(auth, f"Bearer {token}")
+        ):
+            return jsonify(error="Authentication required"), 401
+        return func(*args, **kwargs)
+
+    return wrapper
+
+
 def allowed_file(filename: str) -> bool:
     return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
-def parse_answers_from_text(text: str, limit: int) -> Dict[int, str]:
-    """Parse OCR text into a mapping of question number to answer letter."""
-    pattern = re.compile(r"(\d+)\s*([ABCDEabcde])")
-    answers: Dict[int, str] = {}
-    for match in pattern.finditer(text):
-        num = int(match.group(1))
-        ans = match.group(2).upper()
-        if 1 <= num <= limit:
-            answers[num] = ans
-    return answers
-
-
-def compare_answers(
-    answer_key: List[str], student_answers: Dict[int, str]
-) -> Dict[int, bool]:
-    results: Dict[int, bool] = {}
-    for i in range(1, len(answer_key) + 1):
-        key = answer_key[i - 1].upper()
-        student = student_answers.get(i, "")
-        results[i] = key == student
-    return results
-
-
-def detect_answers_from_bubbles(
-    img: Image.Image, limit: int
-) -> tuple[Dict[int, str], List[Dict[str, float]]]:
-    """Detect filled circles on the standard answer sheet using OpenCV.
-
-    Returns a mapping of question number to the detected answer letter and a
-    list of bounding boxes for each detected circle. Each bounding box is a
-    dictionary with relative percentage coordinates compatible with the result
-    template.
+def regrade_exam(exam_id: int, answer_key: List[str]) -> tuple[int, int]:
+    """Recompute the stored scores of an exam against ``answer_key``.
+
+    Uses the answers saved with each result, so no image is read again.
+    Returns the number of re-graded results and the number skipped because
+    they were stored without answers.
     """
-    gray = cv2.cvtColor(np.array(img), cv2.COLOR_RGB2GRAY)
-    blur = cv2.GaussianBlur(gray, (5, 5), 0)
-    _, thresh = cv2.threshold(
-        blur, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU
-    )
-    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
-    closed = cv2.morphologyEx(thresh, cv2.MORPH_CLOSE, kernel, iterations=2)
-    contours, _ = cv2.findContours(
-        closed, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE
+    from .grading import regrade_scores
+
+    results = data.get_results(exam_id)
+    graded = [r for r in results if r.get("answers")]
+    scores = regrade_scores(answer_key, [r["answers"] for r in graded])
+    data.update_scores(
+        (r["id"], int(score))
+        for r, score in zip(graded, scores)
+        if score != r["score"]
     )
+    data.rebuild_stats(exam_id)
+    return len(graded), len(results) - len(graded)
 
-    circles: List[tuple[int, int, int]] = []
-    for c in contours:
-        area = cv2.contourArea(c)
-        if area < 50:
-            continue
-        (x, y), radius = cv2.minEnclosingCircle(c)
-        if radius < 5 or radius > 30:
-            continue
-        mask = np.zeros_like(gray)
-        cv2.circle(mask, (int(x), int(y)), int(radius), 255, -1)
-        filled_ratio = cv2.mean(thresh, mask=mask)[0] / 255.0
-        if filled_ratio > 0.5:
-            circles.append((int(x), int(y), int(radius)))
-
-    circles.sort(key=lambda t: (t[1], t[0]))
-
-    answers: Dict[int, str] = {}
-    boxes: List[Dict[str, float]] = []
-    row: List[tuple[int, int, int]] = []
-    question = 1
-    row_threshold = 20
-
-    def process_row(r: List[tuple[int, int, int]], q: int) -> None:
-        if not r or q > limit:
-            return
-        r.sort(key=lambda t: t[0])
-        min_x = r[0][0]
-        max_x = r[-1][0]
-        if max_x == min_x:
-            return
-        col_width = (max_x - min_x) / 4.0
-        circ = r[0]
-        idx = int(round((circ[0] - min_x) / col_width))
-        idx = max(0, min(idx, 4))
-        ans = chr(ord("A") + idx)
-        answers[q] = ans
-
-        # bounding box for the detected circle
-        left = max(circ[0] - circ[2], 0)
-        top = max(circ[1] - circ[2], 0)
-        right = min(circ[0] + circ[2], gray.shape[1])
-        bottom = min(circ[1] + circ[2], gray.shape[0])
-        boxes.append(
-            {
-                "num": q,
-                "ans": ans,
-                "left": left / gray.shape[1] * 100,
-                "top": top / gray.shape[0] * 100,
-                "width": (right - left) / gray.shape[1] * 100,
-                "height": (bottom - top) / gray.shape[0] * 100,
-            }
-        )
 
-    for circ in circles:
-        if not row or abs(circ[1] - row[0][1]) < row_threshold:
-            row.append(circ)
-        else:
-            process_row(row, question)
-            question += 1
-            row = [circ]
+def store_result(
+    exam_id: int, result: Dict[str, Any]
+) -> tuple[int, List[str]] | None:
+    """Append one graded result, scored against the exam's current answer key.
 
-    process_row(row, question)
+    ``result`` carries the encoded ``answers``; its ``score`` is recomputed
+    from them, so a key corrected while a sheet was being graded applies to
+    it too. Returns the new row id and the key it was scored against, or
+    None when the exam no longer exists.
+    """
+    from .grading import regrade_scores
 
-    return answers, boxes
+    exam = data.get_exam(exam_id)
+    if exam is None:
+        return None
+    key = exam["answer_key"]
+    result["score"] = int(regrade_scores(key, [result["answers"]])[0])
+    (result_id,) = data.add_results(exam_id, [result])
+    # a key saved after the read above re-graded the stored results, maybe
+    # before this one was inserted
+    exam = data.get_exam(exam_id)
+    if exam is not None and exam["answer_key"] != key:
+        key = exam["answer_key"]
+        regrade_exam(exam_id, key)
+        result["score"] = int(regrade_scores(key, [result["answers"]])[0])
+    return result_id, key
 
 
-def create_app() -> Flask:
+def create_app(config: Mapping[str, Any] | None = None) -> Flask:
     app = Flask(__name__)
     app.secret_key = "change-this-secret"
     app.config["UPLOAD_FOLDER"] = os.path.join(app.root_path, "uploads")
+    # number of processes used to grade uploaded sheets in parallel
+    app.config["GRADING_WORKERS"] = os.cpu_count() or 1
+    # background threads feeding uploaded batches into the grading pool
+    app.config["JOB_WORKERS"] = 2
+    # longest side in pixels of the camera frames the live page sends
+    app.config["LIVE_FRAME_SIDE"] = 960
+    # results listed per page on the exam page
+    app.config["RESULTS_PER_PAGE"] = 100
+    # seconds the streamed results page waits for a sheet before checking again
+    app.config["RESULT_STREAM_POLL"] = 15
+    # options for preprocess.load_sheet, e.g. {"max_side": 1600, "crop": False}
+    app.config["PREPROCESS"] = {}
+    # OCR fallback implementation: "auto", "tesserocr" or "pytesseract"
+    app.config["OCR_BACKEND"] = "auto"
+    # raw detection output keyed by image hash; set the directory to None to disable
+    app.config["DETECTION_CACHE_DIR"] = os.path.join(app.root_path, "cache", "detections")
+    app.config["DETECTION_CACHE_MAX_BYTES"] = 256 * 1024 * 1024
+    # compiled answer sheet layouts, one PDF per exam name and question count
+    app.config["SHEET_CACHE_DIR"] = os.path.join(app.root_path, "cache", "sheets")
+    # bearer token for the JSON API; None allows only logged in sessions
+    app.config["API_TOKEN"] = os.environ.get("OCR_API_TOKEN")
+    # resolution PDF pages are rendered at before grading
+    app.config["PDF_DPI"] = 200
+    # largest image, or uncompressed ZIP entry, accepted as one sheet
+    app.config["MAX_SHEET_BYTES"] = MAX_SHEET_BYTES
+    # browser cache lifetime in seconds for uploads and previews named by content hash
+    app.config["IMMUTABLE_MAX_AGE"] = 365 * 24 * 3600
+    # directory for cProfile dumps of requests made with ?profile=1; None disables
+    app.config["PROFILE_DIR"] = None
+    # grade a blank page in create_app so OpenCV and tesseract are loaded before
+    # a preforking server (e.g. gunicorn --preload) forks its workers
+    app.config["WARM_UP"] = os.environ.get("OCR_WARM_UP", "") not in ("", "0")
+    # overrides the defaults above before anything reads them; grading settings
+    # can also be changed on app.config later and apply to the next request
+    app.config.update(config or {})
     os.makedirs(app.config["UPLOAD_FOLDER"], exist_ok=True)
 
-    store = data.load_data()
+    @app.before_request
+    def start_request_timer():
+        g.request_start = time.perf_counter()
+        if (
+            app.config["PROFILE_DIR"]
+            and request.args.get("profile")
+            and session.get("logged_in")
+        ):
+            g.profiler = cProfile.Profile()
+            g.profiler.enable()
+
+    @app.teardown_request
+    def record_request(exc: BaseException | None) -> None:
+        start = g.pop("request_start", None)
+        if start is not None:
+            registry.observe(
+                "ocr_http_request_seconds",
+                time.perf_counter() - start,
+                endpoint=request.endpoint or "unknown",
+            )
+        profiler = g.pop("profiler", None)
+        if profiler is not None:
+            profiler.disable()
+            os.makedirs(app.config["PROFILE_DIR"], exist_ok=True)
+            name = f"{request.endpoint}-{time.time():.6f}.prof"
+            profiler.dump_stats(os.path.join(app.config["PROFILE_DIR"], name))
 
-    project_name: str | None = None
-    exam_name: str | None = None
-    answer_key: List[str] = []
-    num_questions: int = 50
+    def start_template_timer(sender, template, context, **extra) -> None:
+        g.template_start = time.perf_counter()
+
+    def record_template(sender, template, context, **extra) -> None:
+        start = g.pop("template_start", None)
+        if start is not None:
+            registry.observe(
+                "ocr_template_render_seconds",
+                time.perf_counter() - start,
+                template=template.name or "string",
+            )
+
+    # the handlers are local functions, so keep strong references to them
+    before_render_template.connect(start_template_timer, app, weak=False)
+    template_rendered.connect(record_template, app, weak=False)
+
+    # serialises the look-up-or-create of projects in ``index``
+    write_lock = threading.Lock()
+
+    def grading_context() -> tuple[Dict[str, Any] | None, Dict[str, Any] | None]:
+        """Resolve the project and exam this session is grading.
+
+        Only the ids live in the session; the rows come from the per-process
+        snapshot, so every gunicorn worker resolves the same exam without
+        sharing state. Ids of deleted rows are dropped from the session.
+        """
+        project = data.cached_project(session.get("project_id"))
+        exam = data.cached_exam(session.get("exam_id"))
+        if project is None:
+            session.pop("project_id", None)
+        if exam is None or project is None or exam["project_id"] != project["id"]:
+            session.pop("exam_id", None)
+            exam = None
+        return project, exam
 
     @app.route("/login", methods=["GET", "POST"])
     def login():
@@ -187,7 +281,7 @@ def create_app() -> Flask:
     @app.route("/", methods=["GET", "POST"])
     @login_required
     def index():
-        nonlocal project_name, exam_name, answer_key, num_questions
+        project, exam = grading_context()
         if request.method == "POST":
             # Step 1: project creation
             if "project_name" in request.form:
@@ -195,11 +289,12 @@ def create_app() -> Flask:
                 if not name:
                     flash("Project name is required.", "danger")
                 else:
-                    project_name = name
                     # create project if not exists
-                    if not any(p["name"] == name for p in store["projects"]):
-                        store["projects"].append({"name": name, "exams": []})
-                        data.save_data(store)
+                    with write_lock:
+                        proj = data.find_project(name)
+                        project_id = proj["id"] if proj else data.add_project(name)
+                    session["project_id"] = project_id
+                    session.pop("exam_id", None)
                     flash("Project created.", "success")
                 return redirect(url_for("index"))
 
@@ -216,60 +311,80 @@ def create_app() -> Flask:
                 if not name:
                     flash("Exam name is required.", "danger")
                     return redirect(url_for("index"))
-                exam_name = name
-                num_questions = n
-                answer_key = []
-                # ensure exam entry exists
-                for proj in store["projects"]:
-                    if proj["name"] == project_name:
-                        proj["exams"].append(
-                            {
-                                "name": exam_name,
-                                "num_questions": num_questions,
-                                "answer_key": [],
-                                "results": [],
-                            }
-                        )
-                        data.save_data(store)
-                        break
+                if project is None:
+                    flash("Please create a project first.", "danger")
+                    return redirect(url_for("index"))
+                session["exam_id"] = data.add_exam(project["id"], name, n)
                 flash("Exam details saved.", "success")
                 return redirect(url_for("index"))
 
             # Step 3: answer key
+            if exam is None:
+                flash("Please submit exam details first.", "danger")
+                return redirect(url_for("index"))
             answers: List[str] = []
-            for i in range(1, num_questions + 1):
+            for i in range(1, exam["num_questions"] + 1):
                 val = request.form.get(f"q{i}")
                 if val not in list("ABCDEabcde"):
                     flash("Please select answers for all questions.", "danger")
                     return redirect(url_for("index"))
                 answers.append(val.upper())
-            answer_key = answers
-            # save answer key into store
-            for proj in store["projects"]:
-                if proj["name"] == project_name:
-                    for exam in proj["exams"]:
-                        if exam["name"] == exam_name:
-                            exam["answer_key"] = answer_key
-                            exam["num_questions"] = num_questions
-                            data.save_data(store)
-                            break
-                    break
+            data.set_answer_key(exam["id"], answers)
+            regraded, _ = regrade_exam(exam["id"], answers)
+            if regraded:
+                flash(f"Re-graded {regraded} stored results.", "success")
             flash("Answer key saved. Upload answer sheet image to check.", "success")
             return redirect(url_for("index"))
 
         return render_template(
             "index.html",
-            project_name=project_name,
-            exam_name=exam_name,
-            answer_key=answer_key,
-            num_questions=num_questions,
+            project_name=project["name"] if project else None,
+            exam_name=exam["name"] if exam else None,
+            answer_key=exam["answer_key"] if exam else [],
+            num_questions=exam["num_questions"] if exam else 50,
         )
 
+    def collect_sheets(files) -> tuple[List[str], List[Iterable[bytes]], List[str]]:
+        """Turn uploaded files into sheet names and their lazy image bytes.
+
+        Every upload is spooled to disk and split by ``ingest.expand``, so a
+        sheet is only read into memory when the job takes it. Returns the
+        sheet names, one iterable of image bytes per upload and the names of
+        uploads, or archive entries, that could not be read or were too large.
+        """
+        filenames: List[str] = []
+        parts: List[Iterable[bytes]] = []
+        failed: List[str] = []
+        for file in files:
+            filename = secure_filename(file.filename)
+            fd, tmp = tempfile.mkstemp(suffix="." + extension(filename))
+            os.close(fd)
+            file.save(tmp)
+            try:
+                names, pages, skipped = expand(
+                    tmp, filename, app.config["PDF_DPI"], app.config["MAX_SHEET_BYTES"]
+                )
+            except (
+                RuntimeError,
+                OSError,
+                ValueError,
+                zipfile.BadZipFile,
+                subprocess.CalledProcessError,
+            ):
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+                failed.append(filename)
+                continue
+            filenames.extend(names)
+            parts.append(pages)
+            failed.extend(skipped)
+        return filenames, parts, failed
+
     @app.route("/upload", methods=["POST"])
     @login_required
     def upload():
-        nonlocal project_name, exam_name, answer_key, num_questions
-        if not exam_name or not answer_key:
+        _, exam = grading_context()
+        if exam is None or not exam["answer_key"]:
             flash("Please submit exam details and answer key first.", "danger")
             return redirect(url_for("index"))
         files = request.files.getlist("files")
@@ -278,97 +393,434 @@ def create_app() -> Flask:
             flash("No valid files uploaded.", "danger")
             return redirect(url_for("index"))
 
-        results_list = []
-        for file in valid_files:
+        filenames, parts, failed = collect_sheets(valid_files)
+        for filename in failed:
+            flash(f"Could not read {filename}, or it is too large.", "danger")
+        if not filenames:
+            flash("No sheets found in the uploaded files.", "danger")
+            return redirect(url_for("index"))
 
-            filename = secure_filename(file.filename)
-            filepath = os.path.join(app.config["UPLOAD_FOLDER"], filename)
-            file.save(filepath)
+        job = jobs.submit(
+            filenames,
+            Sheets(parts),
+            list(exam["answer_key"]),
+            exam["num_questions"],
+            meta={"exam_id": exam["id"]},
+            options=grading_options(),
+            grading_workers=app.config["GRADING_WORKERS"],
+        )
+        if request.accept_mimetypes.best == "application/json":
+            return (
+                jsonify(
+                    job_id=job.id,
+                    status_url=url_for("job_status", job_id=job.id),
+                    results_url=url_for("job_view", job_id=job.id),
+                ),
+                202,
+            )
+        return redirect(url_for("job_view", job_id=job.id))
+
+    def persist_sheet(job: Job, sheet: Dict[str, Any]) -> Dict[str, Any]:
+        """Store one graded sheet and return it rescored, with its student."""
+        from .grading import compare_answers, encode_answers
+
+        exam_id = job.meta["exam_id"]
+        code = sheet.get("student_code")
+        students = data.find_codes(exam_id, [code])
+        stored = student_result(
+            {
+                "filename": sheet["filename"],
+                "image": sheet.get("image"),
+                "score": sheet["score"],
+                "answers": encode_answers(sheet["answers"], job.num_questions),
+            },
+            code,
+            students,
+        )
+        saved = store_result(exam_id, stored)
+        if saved is None:
+            return sheet
+        _, key = saved
+        sheet = {
+            **sheet,
+            "score": stored["score"],
+            "results": compare_answers(key, sheet["answers"]),
+        }
+        if "student" in stored:
+            sheet["student"] = stored["student"]
+        return sheet
+
+    def student_result(
+        result: Dict[str, Any], code: str | None, students: Dict[str, int]
+    ) -> Dict[str, Any]:
+        """Attach the student a decoded code was issued to, if any."""
+        if code in students:
+            result.update(student_code=code, student=students[code])
+        return result
+
+    uploads = UploadStore(app.config["UPLOAD_FOLDER"])
+
+    def grading_options(**overrides: Any) -> Dict[str, Any]:
+        """Options for ``grading.grade_sheet``, read from the config on each call."""
+        return {
+            "preprocess": app.config["PREPROCESS"],
+            "ocr_backend": app.config["OCR_BACKEND"],
+            "cache_dir": app.config["DETECTION_CACHE_DIR"],
+            "cache_max_bytes": app.config["DETECTION_CACHE_MAX_BYTES"],
+            **overrides,
+        }
+
+    jobs = JobQueue(
+        workers=app.config["JOB_WORKERS"],
+        on_sheet=persist_sheet,
+        store=uploads.save,
+    )
+
+    def finished_sheets(job: Job) -> Iterator[tuple[int, Dict[str, Any]]]:
+        """Yield ``(index, sheet)`` for every sheet of ``job`` as it finishes."""
+        sent: set = set()
+        while True:
+            # read before scanning so the last pass sees every finished sheet
+            done = job.done
+            for i, sheet in enumerate(job.sheets):
+                if i not in sent and sheet["status"] != "pending":
+                    sent.add(i)
+                    yield i, sheet
+            if done:
+                return
+            job.wait(len(sent), timeout=app.config["RESULT_STREAM_POLL"])
+
+    live_sessions = LiveSessions()
+
+    @app.route("/live")
+    @login_required
+    def live():
+        """Grade sheets held under the device camera one after another."""
+        _, exam = grading_context()
+        if exam is None or not exam["answer_key"]:
+            flash("Set the exam and its answer key first.", "danger")
+            return redirect(url_for("index"))
+        started = live_sessions.start(
+            exam["id"], list(exam["answer_key"]), exam["num_questions"]
+        )
+        session["live_id"] = started.id
+        return render_template(
+            "live.html", exam=exam, frame_side=app.config["LIVE_FRAME_SIDE"]
+        )
+
+    @app.route("/live/frame", methods=["POST"])
+    @login_required
+    def live_frame():
+        """Check one camera frame and grade it once the sheet is held still.
+
+        The body is the encoded frame itself. Only the cheap registration
+        mark check runs on most frames; the grading pipeline runs once per
+        sheet, in this thread, to keep the round trip short.
+        """
+        from .grading import grade_sheet
+
+        live = live_sessions.get(session.get("live_id"))
+        if live is None:
+            return jsonify(error="Live session expired, reload the page"), 409
+        if (request.content_length or 0) > MAX_FRAME_BYTES:
+            return jsonify(error="Frame too large"), 413
+        raw = request.get_data(cache=False)
+        if not raw:
+            return jsonify(error="Expected an encoded frame as the request body"), 400
+        with live.lock:
+            try:
+                status = live.check(raw)
+            except ValueError as exc:
+                return jsonify(error=str(exc)), 400
+            if status == "ready":
+                try:
+                    # frames are unique, so caching their detections would
+                    # only fill the disk
+                    result = grade_sheet(
+                        raw,
+                        live.answer_key,
+                        live.num_questions,
+                        grading_options(cache_dir=None),
+                    )
+                except (OSError, ValueError) as exc:
+                    registry.inc("ocr_sheet_errors_total")
+                    live.stable = 0
+                    return (
+                        jsonify(
+                            error=f"Could not grade the frame: {exc}",
+                            status="unreadable",
+                            last=live.last,
+                        ),
+                        400,
+                    )
+                record_sheet(result)
+                if result["answers"]:
+                    live.graded = True
+                    live.last = store_live_result(live, raw, result)
+                    status = "graded"
+                else:
+                    # wait for another still frame before trying again
+                    live.stable = 0
+                    status = "unreadable"
+            return jsonify(status=status, last=live.last)
+
+    def store_live_result(
+        live: LiveSession, raw: bytes, result: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Store a sheet graded in live mode and return its summary."""
+        from .grading import encode_answers
 
-            img = Image.open(filepath)
-            student_answers, bubble_boxes = detect_answers_from_bubbles(
-                img, num_questions
+        filename = f"live-{time.strftime('%Y%m%d-%H%M%S')}.jpg"
+        stored = student_result(
+            {
+                "filename": filename,
+                "image": uploads.save(raw, filename),
+                "score": result["score"],
+                "answers": encode_answers(result["answers"], live.num_questions),
+            },
+            result["student_code"],
+            data.find_codes(live.exam_id, [result["student_code"]]),
+        )
+        # None once the exam was deleted; the frame is then only shown
+        result_id, key = store_result(live.exam_id, stored) or (None, live.answer_key)
+        return {
+            "id": result_id,
+            "filename": filename,
+            "score": stored["score"],
+            "total": len(key),
+            "student": stored.get("student"),
+            "student_code": stored.get("student_code"),
+            "elapsed": result["elapsed"],
+        }
+
+    @app.route("/jobs/<job_id>")
+    @login_required
+    def job_view(job_id: str):
+        """Stream one summary row per sheet to the browser as it is graded."""
+        job = jobs.get(job_id)
+        if job is None:
+            abort(404)
+        # consume flashed messages now; the session cannot be saved once
+        # the streamed body has started
+        get_flashed_messages(with_categories=True)
+        response = Response(
+            stream_template(
+                "result.html",
+                job=job,
+                sheets=finished_sheets(job),
+                total=len(job.answer_key),
             )
-            if not student_answers:
-                text = pytesseract.image_to_string(img)
-                student_answers = parse_answers_from_text(text, num_questions)
-            results = compare_answers(answer_key, student_answers)
-            score = sum(results.values())
-
-            boxes: List[Dict[str, Any]] = bubble_boxes
-            if not boxes:
-                # fallback bounding boxes from OCR text
-                data_dict = pytesseract.image_to_data(
-                    img, output_type=pytesseract.Output.DICT
-                )
-                width, height = img.size
-                n_words = len(data_dict["text"])
-                for i in range(n_words - 1):
-                    first = data_dict["text"][i].strip()
-                    second = data_dict["text"][i + 1].strip()
-                    if first.isdigit() and len(second) == 1 and second.upper() in "ABCDE":
-                        num = int(first)
-                        if 1 <= num <= num_questions:
-                            left = min(
-                                data_dict["left"][i], data_dict["left"][i + 1]
-                            )
-                            top = min(
-                                data_dict["top"][i], data_dict["top"][i + 1]
-                            )
-                            right = max(
-                                data_dict["left"][i] + data_dict["width"][i],
-                                data_dict["left"][i + 1]
-                                + data_dict["width"][i + 1],
-                            )
-                            bottom = max(
-                                data_dict["top"][i] + data_dict["height"][i],
-                                data_dict["top"][i + 1]
-                                + data_dict["height"][i + 1],
-                            )
-                            boxes.append(
-                                {
-                                    "num": num,
-                                    "ans": second.upper(),
-                                    "left": left / width * 100,
-                                    "top": top / height * 100,
-                                    "width": (right - left) / width * 100,
-                                    "height": (bottom - top) / height * 100,
-                                }
-                            )
-
-            results_list.append(
+        )
+        # ask proxies such as nginx not to hold rows back
+        response.headers["X-Accel-Buffering"] = "no"
+        return response
+
+    @app.route("/jobs/<job_id>/sheets/<int:index>")
+    @login_required
+    def job_sheet(job_id: str, index: int):
+        """Return the per-question detail of one graded sheet as a fragment."""
+        job = jobs.get(job_id)
+        if job is None or not 0 <= index < len(job.sheets):
+            abort(404)
+        sheet = job.sheets[index]
+        if sheet["status"] != "done":
+            abort(404)
+        return render_template(
+            "sheet_detail.html", entry=sheet, total=len(job.answer_key)
+        )
+
+    @app.route("/jobs/<job_id>/status")
+    @login_required
+    def job_status(job_id: str):
+        """Report per-sheet progress and partial results as JSON."""
+        job = jobs.get(job_id)
+        if job is None:
+            return jsonify(error="Job not found"), 404
+        return jsonify(job.to_dict())
+
+    @app.route("/api/exams")
+    @api_login_required
+    def api_exams():
+        """List all projects and exams with the ids used by the grading API."""
+        return jsonify(
+            projects=[
                 {
-                    "filename": filename,
-                    "results": results,
-                    "score": score,
-                    "boxes": boxes,
+                    "id": proj["id"],
+                    "name": proj["name"],
+                    "exams": [
+                        {
+                            "id": exam["id"],
+                            "name": exam["name"],
+                            "num_questions": exam["num_questions"],
+                            "has_answer_key": bool(exam["answer_key"]),
+                        }
+                        for exam in proj["exams"]
+                    ],
                 }
-            )
+                for proj in data.snapshot()["projects"]
+            ]
+        )
 
-            # persist results
-            for proj in store["projects"]:
-                if proj["name"] == project_name:
-                    for exam in proj["exams"]:
-                        if exam["name"] == exam_name:
-                            exam.setdefault("results", []).append(
-                                {
-                                    "filename": filename,
-                                    "score": score,
-                                }
-                            )
-                            data.save_data(store)
-                            break
-                    break
+    def api_exam(exam_id: int):
+        """Return the exam or a JSON error response."""
+        exam = data.get_exam(exam_id)
+        if exam is None:
+            return None, (jsonify(error="Exam not found"), 404)
+        if not exam["answer_key"]:
+            return None, (jsonify(error="Exam has no answer key"), 409)
+        return exam, None
 
-        return render_template(
-            "result.html", results_list=results_list, total=len(answer_key)
+    @app.route("/api/exams/<int:exam_id>/grade", methods=["POST"])
+    @api_login_required
+    def api_grade(exam_id: int):
+        """Grade one image synchronously, store the result and return it."""
+        from concurrent.futures.process import BrokenProcessPool
+
+        from .grading import compare_answers, encode_answers, grade_in_pool, grade_sheet
+
+        exam, error = api_exam(exam_id)
+        if error:
+            return error
+        file = request.files.get("file")
+        if not file or extension(file.filename) not in IMAGE_EXTENSIONS:
+            return jsonify(error="Expected an image in the 'file' field"), 400
+        filename = secure_filename(file.filename)
+        raw = file.read()
+        args = (raw, exam["answer_key"], exam["num_questions"], grading_options())
+        workers = app.config["GRADING_WORKERS"]
+        try:
+            if workers > 1:
+                result = grade_in_pool(workers, *args)
+            else:
+                result = grade_sheet(*args)
+        except (OSError, ValueError) as exc:
+            # PIL's UnidentifiedImageError is an OSError
+            registry.inc("ocr_sheet_errors_total")
+            return jsonify(error=f"Could not grade {filename}: {exc}"), 400
+        except BrokenProcessPool:
+            # the worker grading this sheet died, e.g. out of memory
+            registry.inc("ocr_sheet_errors_total")
+            return jsonify(error=f"Grading {filename} crashed its worker"), 500
+        record_sheet(result)
+        image = uploads.save(raw, filename)
+        stored = student_result(
+            {
+                "filename": filename,
+                "image": image,
+                "score": result["score"],
+                "answers": encode_answers(result["answers"], exam["num_questions"]),
+            },
+            result["student_code"],
+            data.find_codes(exam_id, [result["student_code"]]),
+        )
+        saved = store_result(exam_id, stored)
+        if saved is None:
+            return jsonify(error="Exam not found"), 404
+        result_id, key = saved
+        return jsonify(
+            {
+                **result,
+                "id": result_id,
+                "exam_id": exam_id,
+                "filename": filename,
+                "image": image,
+                "score": stored["score"],
+                "results": compare_answers(key, result["answers"]),
+                "student": stored.get("student"),
+                "total": len(key),
+            }
+        )
+
+    @app.route("/api/exams/<int:exam_id>/batch", methods=["POST"])
+    @api_login_required
+    def api_batch(exam_id: int):
+        """Queue many images, PDFs or ZIP archives and return the job id."""
+        exam, error = api_exam(exam_id)
+        if error:
+            return error
+        files = [f for f in request.files.getlist("files") if f and allowed_file(f.filename)]
+        filenames, parts, failed = collect_sheets(files)
+        if not filenames:
+            return jsonify(error="No sheets found in the uploaded files", failed=failed), 400
+        job = jobs.submit(
+            filenames,
+            Sheets(parts),
+            exam["answer_key"],
+            exam["num_questions"],
+            meta={"exam_id": exam_id},
+            options=grading_options(),
+            grading_workers=app.config["GRADING_WORKERS"],
         )
+        return (
+            jsonify(
+                job_id=job.id,
+                status_url=url_for("api_job", job_id=job.id),
+                failed=failed,
+            ),
+            202,
+        )
+
+    @app.route("/api/jobs/<job_id>")
+    @api_login_required
+    def api_job(job_id: str):
+        """Report the progress and results of a batch as JSON."""
+        job = jobs.get(job_id)
+        if job is None:
+            return jsonify(error="Job not found"), 404
+        return jsonify(job.to_dict())
+
+    def export_response(
+        exams: List[Dict[str, Any]], fmt: str, name: str, with_exam: bool = False
+    ) -> Response:
+        """Stream the results of ``exams`` as a CSV or XLSX download."""
+        rows = export.result_rows(
+            exams, data.iter_results([e["id"] for e in exams]), with_exam
+        )
+        if fmt == "xlsx":
+            body, mimetype = export.iter_xlsx(rows, name), export.XLSX_CONTENT_TYPE
+        else:
+            body, mimetype = export.iter_csv(rows), "text/csv"
+        filename = secure_filename(name) or "results"
+        return Response(
+            body,
+            mimetype=mimetype,
+            headers={
+                "Content-Disposition": f'attachment; filename="{filename}.{fmt}"',
+                "X-Accel-Buffering": "no",
+            },
+        )
+
+    @app.route("/api/exams/<int:exam_id>/export.<any(csv, xlsx):fmt>")
+    @api_login_required
+    def export_exam(exam_id: int, fmt: str):
+        """Download all results of one exam."""
+        exam = data.get_exam(exam_id)
+        if exam is None:
+            return jsonify(error="Exam not found"), 404
+        return export_response([exam], fmt, exam["name"])
+
+    @app.route("/api/projects/<int:project_id>/export.<any(csv, xlsx):fmt>")
+    @api_login_required
+    def export_project(project_id: int, fmt: str):
+        """Download the results of every exam in a project, one row per result."""
+        project = data.get_project(project_id)
+        if project is None:
+            return jsonify(error="Project not found"), 404
+        return export_response(project["exams"], fmt, project["name"], with_exam=True)
+
+    @app.route("/metrics")
+    @api_login_required
+    def metrics():
+        """Expose timings and counters in the Prometheus text format."""
+        return Response(registry.render(), mimetype="text/plain; version=0.0.4")
 
     @app.route("/download")
     @login_required
     def download_sheet():
-        nonlocal exam_name, num_questions, answer_key
-        if not exam_name:
+        from .grading import CODE_DIGITS
+
+        _, exam = grading_context()
+        if exam is None:
             flash("Exam details not set.", "danger")
             return redirect(url_for("index"))
         try:
@@ -376,61 +828,83 @@ def create_app() -> Flask:
         except ValueError:
             n = 1
         n = max(1, min(n, 500))
-        codes = [uuid.uuid4().hex[:8] for _ in range(n)]
-        tex = render_template(
-            "answer_sheet.tex",
-            exam_name=exam_name,
-            num_questions=num_questions,
-            answer_key=answer_key,
-            codes=codes,
-        )
-        tmpdir = os.path.join(app.root_path, "tmp")
-        os.makedirs(tmpdir, exist_ok=True)
-        tex_path = os.path.join(tmpdir, "sheet.tex")
-        pdf_path = os.path.join(tmpdir, "sheet.pdf")
-        with open(tex_path, "w") as f:
-            f.write(tex)
+        codes = data.issue_codes(exam["id"], n, CODE_DIGITS)
         try:
-            subprocess.run(
-                [
-                    "pdflatex",
-                    "-interaction=nonstopmode",
-                    "-output-directory",
-                    tmpdir,
-                    tex_path,
-                ],
-                check=True,
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.DEVNULL,
+            pdf = sheets.class_set(
+                exam["name"], exam["num_questions"], codes, app.config["SHEET_CACHE_DIR"]
             )
-        except (FileNotFoundError, subprocess.CalledProcessError):
+        except (OSError, subprocess.CalledProcessError):
             flash(
                 "pdflatex not found or failed to generate PDF. Please install LaTeX.",
                 "danger",
             )
             return redirect(url_for("index"))
 
-        if not os.path.exists(pdf_path):
-            flash("Failed to generate PDF", "danger")
-            return redirect(url_for("index"))
-
         return send_file(
-            pdf_path,
+            io.BytesIO(pdf),
+            mimetype="application/pdf",
             as_attachment=True,
-            download_name=f"{exam_name}_answer_sheet.pdf",
+            download_name=f"{exam['name']}_answer_sheet.pdf",
         )
 
+    def cache_forever(response: Response) -> Response:
+        """Let the browser keep a response for content addressed files."""
+        response.cache_control.no_cache = None
+        response.cache_control.public = False
+        response.cache_control.private = True
+        response.cache_control.max_age = app.config["IMMUTABLE_MAX_AGE"]
+        response.cache_control.immutable = True
+        return response
+
     @app.route("/uploads/<path:filename>")
     @login_required
     def uploaded_file(filename: str):
-        """Serve uploaded images for preview."""
-        return send_file(os.path.join(app.config["UPLOAD_FOLDER"], filename))
+        """Serve an uploaded original."""
+        pending = uploads.pending(filename)
+        if pending is not None:
+            response = send_file(
+                io.BytesIO(pending),
+                download_name=filename,
+                etag=filename.rsplit(".", 1)[0],
+            )
+        else:
+            response = send_from_directory(app.config["UPLOAD_FOLDER"], filename)
+        return cache_forever(response) if HASH_NAME.match(filename) else response
+
+    @app.route("/previews/<size>/<path:filename>")
+    @login_required
+    def upload_preview(size: str, filename: str):
+        """Serve a downscaled WebP or JPEG copy of an uploaded image."""
+        from PIL import features
+
+        if size not in PREVIEW_SIZES:
+            abort(404)
+        webp = features.check("webp") and any(
+            mime == "image/webp" and quality for mime, quality in request.accept_mimetypes
+        )
+        fmt = "webp" if webp else "jpeg"
+        path = uploads.preview(filename, size, fmt)
+        if path is None:
+            abort(404)
+        response = send_file(
+            path,
+            mimetype=f"image/{fmt}",
+            etag=os.path.basename(path),
+        )
+        response.vary.add("Accept")
+        return cache_forever(response)
 
     @app.route("/dashboard")
     @login_required
     def dashboard():
-        data_store = data.load_data()
-        return render_template("dashboard.html", projects=data_store.get("projects", []))
+        # neither source reads results: the snapshot holds projects and exams
+        # only and the summaries are one exam_stats row per exam
+        data_store = data.snapshot()
+        return render_template(
+            "dashboard.html",
+            projects=data_store.get("projects", []),
+            stats=data.all_stats(),
+        )
 
     @app.route("/project/new", methods=["POST"])
     @login_required
@@ -439,19 +913,17 @@ def create_app() -> Flask:
         if not name:
             flash("Project name required", "danger")
             return redirect(url_for("dashboard"))
-        data_store = data.load_data()
-        if any(p.get("name") == name for p in data_store.get("projects", [])):
+        if data.find_project(name) is not None:
             flash("Project already exists", "danger")
             return redirect(url_for("dashboard"))
-        data_store.setdefault("projects", []).append({"name": name, "exams": []})
-        data.save_data(data_store)
+        data.add_project(name)
         flash("Project created", "success")
         return redirect(url_for("dashboard"))
 
     @app.route("/project/<int:pid>/exam/new", methods=["POST"])
     @login_required
     def create_exam(pid: int):
-        data_store = data.load_data()
+        data_store = data.snapshot()
         if pid < 0 or pid >= len(data_store.get("projects", [])):
             flash("Project not found", "danger")
             return redirect(url_for("dashboard"))
@@ -464,15 +936,14 @@ def create_app() -> Flask:
         if not name or num <= 0:
             flash("Invalid exam data", "danger")
             return redirect(url_for("dashboard"))
-        project.setdefault("exams", []).append({"name": name, "num_questions": num, "answer_key": [], "results": []})
-        data.save_data(data_store)
+        data.add_exam(project["id"], name, num)
         flash("Exam created", "success")
         return redirect(url_for("dashboard"))
 
     @app.route("/project/<int:pid>")
     @login_required
     def view_project(pid: int):
-        data_store = data.load_data()
+        data_store = data.snapshot()
         if pid < 0 or pid >= len(data_store.get("projects", [])):
             flash("Project not found", "danger")
             return redirect(url_for("dashboard"))
@@ -482,7 +953,7 @@ def create_app() -> Flask:
     @app.route("/project/<int:pid>/edit", methods=["GET", "POST"])
     @login_required
     def edit_project(pid: int):
-        data_store = data.load_data()
+        data_store = data.snapshot()
         if pid < 0 or pid >= len(data_store.get("projects", [])):
             flash("Project not found", "danger")
             return redirect(url_for("dashboard"))
@@ -492,8 +963,7 @@ def create_app() -> Flask:
             if not name:
                 flash("Name required", "danger")
             else:
-                project["name"] = name
-                data.save_data(data_store)
+                data.rename_project(project["id"], name)
                 flash("Project updated", "success")
                 return redirect(url_for("view_project", pid=pid))
         return render_template("project_edit.html", project=project, pid=pid)
@@ -501,10 +971,9 @@ def create_app() -> Flask:
     @app.route("/project/<int:pid>/delete", methods=["POST"])
     @login_required
     def delete_project(pid: int):
-        data_store = data.load_data()
+        data_store = data.snapshot()
         if 0 <= pid < len(data_store.get("projects", [])):
-            data_store["projects"].pop(pid)
-            data.save_data(data_store)
+            data.delete_project(data_store["projects"][pid]["id"])
             flash("Project deleted", "success")
         else:
             flash("Project not found", "danger")
@@ -513,7 +982,7 @@ def create_app() -> Flask:
     @app.route("/project/<int:pid>/exam/<int:eid>")
     @login_required
     def view_exam(pid: int, eid: int):
-        data_store = data.load_data()
+        data_store = data.snapshot()
         if pid < 0 or pid >= len(data_store.get("projects", [])):
             flash("Project not found", "danger")
             return redirect(url_for("dashboard"))
@@ -522,14 +991,51 @@ def create_app() -> Flask:
             flash("Exam not found", "danger")
             return redirect(url_for("view_project", pid=pid))
         exam = project["exams"][eid]
-        return render_template("exam_view.html", exam=exam, pid=pid)
+        stats = data.get_stats(exam["id"])
+        per_page = app.config["RESULTS_PER_PAGE"]
+        pages = max(1, -(-stats["count"] // per_page))
+        page = min(max(request.args.get("page", 1, type=int), 1), pages)
+        return render_template(
+            "exam_view.html",
+            exam=exam,
+            pid=pid,
+            eid=eid,
+            stats=stats,
+            results=data.get_results(exam["id"], per_page, (page - 1) * per_page),
+            page=page,
+            pages=pages,
+        )
+
+    @app.route("/project/<int:pid>/exam/<int:eid>/regrade", methods=["POST"])
+    @login_required
+    def regrade(pid: int, eid: int):
+        """Re-score all stored results of an exam against its current key."""
+        data_store = data.snapshot()
+        if pid < 0 or pid >= len(data_store.get("projects", [])):
+            flash("Project not found", "danger")
+            return redirect(url_for("dashboard"))
+        project = data_store["projects"][pid]
+        if eid < 0 or eid >= len(project.get("exams", [])):
+            flash("Exam not found", "danger")
+            return redirect(url_for("view_project", pid=pid))
+        exam = project["exams"][eid]
+        if not exam.get("answer_key"):
+            flash("Exam has no answer key", "danger")
+            return redirect(url_for("view_exam", pid=pid, eid=eid))
+        regraded, skipped = regrade_exam(exam["id"], exam["answer_key"])
+        flash(f"Re-graded {regraded} results", "success")
+        if skipped:
+            flash(
+                f"{skipped} older results have no stored answers and were not re-graded",
+                "danger",
+            )
+        return redirect(url_for("view_exam", pid=pid, eid=eid))
 
     @app.route("/project/<int:pid>/exam/<int:eid>/ocr")
     @login_required
     def ocr_exam(pid: int, eid: int):
         """Load an existing exam into the main OCR workflow."""
-        nonlocal project_name, exam_name, answer_key, num_questions
-        data_store = data.load_data()
+        data_store = data.snapshot()
         if pid < 0 or pid >= len(data_store.get("projects", [])):
             flash("Project not found", "danger")
             return redirect(url_for("dashboard"))
@@ -539,10 +1045,8 @@ def create_app() -> Flask:
             return redirect(url_for("view_project", pid=pid))
         exam = project["exams"][eid]
 
-        project_name = project["name"]
-        exam_name = exam["name"]
-        answer_key = exam.get("answer_key", [])
-        num_questions = exam.get("num_questions", 50)
+        session["project_id"] = project["id"]
+        session["exam_id"] = exam["id"]
 
         flash("Loaded exam into OCR checker", "success")
         return redirect(url_for("index"))
@@ -550,7 +1054,7 @@ def create_app() -> Flask:
     @app.route("/project/<int:pid>/exam/<int:eid>/edit", methods=["GET", "POST"])
     @login_required
     def edit_exam(pid: int, eid: int):
-        data_store = data.load_data()
+        data_store = data.snapshot()
         if pid < 0 or pid >= len(data_store.get("projects", [])):
             flash("Project not found", "danger")
             return redirect(url_for("dashboard"))
@@ -568,9 +1072,7 @@ def create_app() -> Flask:
             if not name or n <= 0:
                 flash("Invalid input", "danger")
             else:
-                exam["name"] = name
-                exam["num_questions"] = n
-                data.save_data(data_store)
+                data.update_exam(exam["id"], name, n)
                 flash("Exam updated", "success")
                 return redirect(url_for("view_project", pid=pid))
         return render_template("exam_edit.html", exam=exam, pid=pid)
@@ -578,19 +1080,28 @@ def create_app() -> Flask:
     @app.route("/project/<int:pid>/exam/<int:eid>/delete", methods=["POST"])
     @login_required
     def delete_exam(pid: int, eid: int):
-        data_store = data.load_data()
+        data_store = data.snapshot()
         if pid < 0 or pid >= len(data_store.get("projects", [])):
             flash("Project not found", "danger")
             return redirect(url_for("dashboard"))
         project = data_store["projects"][pid]
         if 0 <= eid < len(project.get("exams", [])):
-            project["exams"].pop(eid)
-            data.save_data(data_store)
+            data.delete_exam(project["exams"][eid]["id"])
             flash("Exam deleted", "success")
         else:
             flash("Exam not found", "danger")
         return redirect(url_for("view_project", pid=pid))
 
+    if app.config["WARM_UP"]:
+        from .grading import warm_up
+
+        with registry.timed("ocr_warm_up_seconds"):
+            try:
+                warm_up(app.config["OCR_BACKEND"])
+            except (OSError, RuntimeError) as exc:
+                # only the OCR fallback needs tesseract; grading works without it
+                app.logger.warning("OCR backend unavailable during warm-up: %s", exc)
+
     return app
 
 
@@ -0,0 +1,98 @@
+import hashlib
+import json
+import os
+import tempfile
+from typing import Any, Dict
+
+
+def content_hash(data: bytes) -> str:
+    """Return the SHA-256 hex digest identifying an uploaded file."""
+    return hashlib.sha256(data).hexdigest()
+
+
+class DetectionCache:
+    """On-disk cache of raw detection output keyed by image content.
+
+    Entries are small JSON files named after the image hash combined with
+    the detector parameters, so changing the detector or its settings never
+    returns stale output. Reading an entry refreshes its modification time
+    and the least recently used entries are removed once the directory grows
+    beyond ``max_bytes``. Writes are atomic, so several grading processes can
+    share one directory.
+    """
+
+    # scanning the directory is not free, so only check the size every N writes
+    evict_every = 32
+
+    def __init__(self, directory: str, max_bytes: int = 256 * 1024 * 1024) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._puts = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, image_hash: str, params: Dict[str, Any]) -> str:
+        digest = hashlib.sha256(
+            json.dumps(params, sort_keys=True, default=str).encode()
+        ).hexdigest()
+        return f"{image_hash}-{digest[:16]}"
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str) -> Dict[str, Any] | None:
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                value = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return value
+
+    def put(self, key: str, value: Dict[str, Any]) -> None:
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(value, f)
+        os.replace(tmp, self._path(key))
+        self._puts += 1
+        if self._puts % self.evict_every == 1:
+            self.evict()
+
+    def evict(self) -> None:
+        """Delete least recently used entries until the size limit holds."""
+        entries = []
+        total = 0
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if not entry.name.endswith(".json"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+        if total <= self.max_bytes:
+            return
+        for _, size, path in sorted(entries):
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+
+_caches: Dict[tuple, DetectionCache] = {}
+
+
+def get_cache(directory: str, max_bytes: int = 256 * 1024 * 1024) -> DetectionCache:
+    """Return this process's cache instance for ``directory``."""
+    cache = _caches.get((directory, max_bytes))
+    if cache is None:
+        cache = _caches[(directory, max_bytes)] = DetectionCache(directory, max_bytes)
+    return cache
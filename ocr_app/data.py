@@ -1,28 +1,682 @@
 import json
 import os
-from typing import Any, Dict
+import secrets
+import sqlite3
+import sys
+import threading
+from typing import Any, Dict, Iterable, Iterator, List
+
+from . import stats
+from .metrics import registry
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS projects (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    position INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_projects_name ON projects(name);
+CREATE TABLE IF NOT EXISTS exams (
+    id INTEGER PRIMARY KEY,
+    project_id INTEGER NOT NULL REFERENCES projects(id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    num_questions INTEGER NOT NULL,
+    answer_key TEXT NOT NULL DEFAULT '[]',
+    position INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_exams_project ON exams(project_id, name);
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY,
+    exam_id INTEGER NOT NULL REFERENCES exams(id) ON DELETE CASCADE,
+    filename TEXT NOT NULL,
+    score INTEGER NOT NULL,
+    extra TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_results_exam ON results(exam_id, id);
+CREATE TABLE IF NOT EXISTS exam_codes (
+    id INTEGER PRIMARY KEY,
+    exam_id INTEGER NOT NULL REFERENCES exams(id) ON DELETE CASCADE,
+    code TEXT NOT NULL,
+    number INTEGER NOT NULL,
+    UNIQUE (exam_id, code)
+);
+CREATE TABLE IF NOT EXISTS exam_stats (
+    exam_id INTEGER PRIMARY KEY REFERENCES exams(id) ON DELETE CASCADE,
+    basis TEXT NOT NULL,
+    sums TEXT NOT NULL
+);
+"""
+
+# result keys stored in their own columns; anything else goes into ``extra``
+RESULT_COLUMNS = ("id", "filename", "score")
+
+_local = threading.local()
+_init_lock = threading.Lock()
+_initialized: set = set()
+
 
 def get_data_file() -> str:
-    """Return the path to the JSON data file."""
+    """Return the path to the legacy JSON data file."""
     base = os.path.dirname(__file__)
     return os.path.join(base, "data.json")
 
 
-def load_data() -> Dict[str, Any]:
-    """Load project data from the JSON file."""
-    path = get_data_file()
+def get_db_file() -> str:
+    """Return the path to the SQLite database."""
+    base = os.path.dirname(__file__)
+    return os.path.join(base, "data.db")
+
+
+def connect() -> sqlite3.Connection:
+    """Return this thread's connection, creating the schema on first use.
+
+    Connections are kept per thread (and per process, so forked grading
+    workers never reuse the parent's handle). The database runs in WAL mode
+    so readers are not blocked while a request writes.
+    """
+    path = get_db_file()
+    key = (os.getpid(), path)
+    conn = getattr(_local, "conns", {}).get(key)
+    if conn is not None:
+        return conn
+    conn = sqlite3.connect(path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA foreign_keys=ON")
+    if not hasattr(_local, "conns"):
+        _local.conns = {}
+    _local.conns[key] = conn
+    with _init_lock:
+        if path not in _initialized:
+            conn.executescript(SCHEMA)
+            migrate_json(conn)
+            _initialized.add(path)
+    return conn
+
+
+def migrate_json(conn: sqlite3.Connection | None = None, path: str | None = None) -> bool:
+    """Import the legacy ``data.json`` into the database once.
+
+    Returns ``True`` if data was imported. The JSON file is left untouched so
+    it can be kept as a backup.
+    """
+    conn = conn or connect()
+    if conn.execute("SELECT 1 FROM meta WHERE key = 'json_migrated'").fetchone():
+        return False
+    path = path or get_data_file()
+    legacy: Dict[str, Any] = {"projects": []}
     if os.path.exists(path):
         with open(path, "r", encoding="utf-8") as f:
             try:
-                return json.load(f)
+                legacy = json.load(f)
             except json.JSONDecodeError:
                 pass
-    return {"projects": []}
+    with conn:
+        _sync(conn, legacy)
+        _bump_version(conn)
+        conn.execute(
+            "INSERT INTO meta (key, value) VALUES ('json_migrated', ?)", (path,)
+        )
+    return bool(legacy.get("projects"))
+
+
+def _bump_version(conn: sqlite3.Connection) -> None:
+    """Mark the data as changed; must run inside the writing transaction."""
+    conn.execute(
+        "INSERT INTO meta (key, value) VALUES ('version', '1') "
+        "ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1"
+    )
+
+
+def get_version() -> int:
+    """Return the current data version, bumped by every change to projects or exams.
+
+    Adding or re-scoring results leaves it alone; they are not part of the
+    cached snapshot.
+    """
+    row = connect().execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+    return int(row[0]) if row else 0
+
+
+class DataCache:
+    """Process wide, read-only view of all projects and exams, without results.
+
+    The cached structure is rebuilt only when the version stored in the
+    database has changed, which also picks up writes made by other worker
+    processes. Results are read per exam (``get_results``), so grading does
+    not invalidate the cache. Callers must not mutate the returned dictionary.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._version = -1
+        self._data: Dict[str, Any] = {"projects": []}
+        self._index: Dict[str, Dict[int, Dict[str, Any]]] = {"projects": {}, "exams": {}}
+
+    def _refresh(self) -> None:
+        version = get_version()
+        if version == self._version:
+            return
+        with self._lock:
+            if version != self._version:
+                loaded_version, loaded = _load(connect(), with_results=False)
+                index: Dict[str, Dict[int, Dict[str, Any]]] = {"projects": {}, "exams": {}}
+                for proj in loaded["projects"]:
+                    index["projects"][proj["id"]] = proj
+                    for exam in proj["exams"]:
+                        index["exams"][exam["id"]] = exam
+                # publish the data before the version lock-free readers check
+                self._data, self._index = loaded, index
+                self._version = loaded_version
+
+    def get(self) -> Dict[str, Any]:
+        self._refresh()
+        return self._data
+
+    def lookup(self, kind: str, row_id: int | None) -> Dict[str, Any] | None:
+        """Return the cached project or exam (``kind``) with ``row_id``."""
+        self._refresh()
+        return self._index[kind].get(row_id) if row_id is not None else None
+
+
+_cache = DataCache()
+
+
+def snapshot() -> Dict[str, Any]:
+    """Return the shared cached projects and exams; treat it as read-only."""
+    return _cache.get()
+
+
+def cached_project(project_id: int | None) -> Dict[str, Any] | None:
+    """Return a project from the shared snapshot by id; treat it as read-only."""
+    return _cache.lookup("projects", project_id)
+
+
+def cached_exam(exam_id: int | None) -> Dict[str, Any] | None:
+    """Return an exam from the shared snapshot by id; treat it as read-only."""
+    return _cache.lookup("exams", exam_id)
+
+
+def _result_row(row: sqlite3.Row) -> Dict[str, Any]:
+    result = {"id": row["id"], "filename": row["filename"], "score": row["score"]}
+    if row["extra"]:
+        result.update(json.loads(row["extra"]))
+    return result
+
+
+def _exam_row(row: sqlite3.Row) -> Dict[str, Any]:
+    return {
+        "id": row["id"],
+        "project_id": row["project_id"],
+        "name": row["name"],
+        "num_questions": row["num_questions"],
+        "answer_key": json.loads(row["answer_key"]),
+    }
+
+
+def load_data() -> Dict[str, Any]:
+    """Load all projects, exams and results as nested dictionaries.
+
+    The structure matches the legacy JSON file, with an extra ``id`` key on
+    every project, exam and result so ``save_data`` can write it back.
+    """
+    return _load(connect())[1]
+
+
+def _load(
+    conn: sqlite3.Connection, with_results: bool = True
+) -> tuple[int, Dict[str, Any]]:
+    """Read everything plus the matching version in one read transaction.
+
+    Without ``with_results`` exams carry no ``results`` key and the results
+    table is not read at all.
+    """
+    conn.execute("BEGIN")
+    try:
+        row = conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        version = int(row[0]) if row else 0
+        projects: List[Dict[str, Any]] = []
+        by_project: Dict[int, Dict[str, Any]] = {}
+        for row in conn.execute("SELECT id, name FROM projects ORDER BY position, id"):
+            proj = {"id": row["id"], "name": row["name"], "exams": []}
+            projects.append(proj)
+            by_project[row["id"]] = proj
+        by_exam: Dict[int, Dict[str, Any]] = {}
+        for row in conn.execute("SELECT * FROM exams ORDER BY position, id"):
+            exam = _exam_row(row)
+            if with_results:
+                exam["results"] = []
+            by_project[row["project_id"]]["exams"].append(exam)
+            by_exam[row["id"]] = exam
+        if with_results:
+            for row in conn.execute("SELECT * FROM results ORDER BY id"):
+                by_exam[row["exam_id"]]["results"].append(_result_row(row))
+    finally:
+        conn.commit()
+    return version, {"projects": projects}
 
 
 def save_data(data: Dict[str, Any]) -> None:
-    """Save project data to the JSON file."""
-    path = get_data_file()
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2)
+    """Write project data back to the database.
+
+    Projects and exams are upserted by ``id`` and removed, with their
+    results, when missing from ``data``, so only pass a structure that has
+    just been loaded. Results are append-only: entries without an ``id`` are
+    inserted, existing rows are never rewritten here. The app edits single
+    rows with ``add_project``, ``update_exam`` and friends instead.
+    """
+    conn = connect()
+    with registry.timed("ocr_db_write_seconds", op="save_data"), conn:
+        _sync(conn, data)
+        _bump_version(conn)
+
+
+def _sync(conn: sqlite3.Connection, data: Dict[str, Any]) -> None:
+    project_ids: List[int] = []
+    exam_ids: List[int] = []
+    for pos, proj in enumerate(data.get("projects", [])):
+        proj["id"] = _upsert(
+            conn,
+            "projects",
+            proj.get("id"),
+            {"name": proj["name"], "position": pos},
+        )
+        project_ids.append(proj["id"])
+        for epos, exam in enumerate(proj.get("exams", [])):
+            exam["id"] = _upsert(
+                conn,
+                "exams",
+                exam.get("id"),
+                {
+                    "project_id": proj["id"],
+                    "name": exam["name"],
+                    "num_questions": exam.get("num_questions", 0),
+                    "answer_key": json.dumps(exam.get("answer_key", [])),
+                    "position": epos,
+                },
+            )
+            exam_ids.append(exam["id"])
+            new = [r for r in exam.get("results", []) if r.get("id") is None]
+            for result, rid in zip(new, add_results(exam["id"], new, conn)):
+                result["id"] = rid
+    _delete_missing(conn, "exams", exam_ids)
+    _delete_missing(conn, "projects", project_ids)
+
+
+def _upsert(
+    conn: sqlite3.Connection, table: str, row_id: int | None, values: Dict[str, Any]
+) -> int:
+    cols = list(values)
+    if row_id is None:
+        cur = conn.execute(
+            f"INSERT INTO {table} ({', '.join(cols)}) "
+            f"VALUES ({', '.join('?' for _ in cols)})",
+            [values[c] for c in cols],
+        )
+        return cur.lastrowid
+    conn.execute(
+        f"INSERT INTO {table} (id, {', '.join(cols)}) "
+        f"VALUES (?, {', '.join('?' for _ in cols)}) "
+        f"ON CONFLICT(id) DO UPDATE SET "
+        + ", ".join(f"{c} = excluded.{c}" for c in cols),
+        [row_id] + [values[c] for c in cols],
+    )
+    return row_id
+
+
+def _delete_missing(conn: sqlite3.Connection, table: str, keep: List[int]) -> None:
+    existing = {row[0] for row in conn.execute(f"SELECT id FROM {table}")}
+    stale = existing.difference(keep)
+    conn.executemany(f"DELETE FROM {table} WHERE id = ?", [(i,) for i in stale])
+
+
+def find_project(name: str) -> Dict[str, Any] | None:
+    """Look up the first project called ``name`` without loading its exams."""
+    row = connect().execute(
+        "SELECT id, name FROM projects WHERE name = ? ORDER BY position, id LIMIT 1",
+        (name,),
+    ).fetchone()
+    return {"id": row["id"], "name": row["name"]} if row else None
+
+
+def get_project(project_id: int) -> Dict[str, Any] | None:
+    """Look up a project and its exams by id without loading results."""
+    conn = connect()
+    row = conn.execute("SELECT id, name FROM projects WHERE id = ?", (project_id,)).fetchone()
+    if row is None:
+        return None
+    exams = conn.execute(
+        "SELECT * FROM exams WHERE project_id = ? ORDER BY position, id", (project_id,)
+    )
+    return {"id": row["id"], "name": row["name"], "exams": [_exam_row(e) for e in exams]}
+
+
+def get_exam(exam_id: int) -> Dict[str, Any] | None:
+    """Look up an exam by id without loading results."""
+    row = connect().execute("SELECT * FROM exams WHERE id = ?", (exam_id,)).fetchone()
+    return _exam_row(row) if row else None
+
+
+def add_project(name: str) -> int:
+    """Create a project after the existing ones and return its id."""
+    conn = connect()
+    with registry.timed("ocr_db_write_seconds", op="add_project"), conn:
+        cur = conn.execute(
+            "INSERT INTO projects (name, position) "
+            "SELECT ?, COALESCE(MAX(position), -1) + 1 FROM projects",
+            (name,),
+        )
+        _bump_version(conn)
+        return cur.lastrowid
+
+
+def rename_project(project_id: int, name: str) -> None:
+    """Change the name of one project."""
+    conn = connect()
+    with registry.timed("ocr_db_write_seconds", op="rename_project"), conn:
+        conn.execute("UPDATE projects SET name = ? WHERE id = ?", (name, project_id))
+        _bump_version(conn)
+
+
+def delete_project(project_id: int) -> None:
+    """Delete a project together with its exams and their results."""
+    conn = connect()
+    with registry.timed("ocr_db_write_seconds", op="delete_project"), conn:
+        conn.execute("DELETE FROM projects WHERE id = ?", (project_id,))
+        _bump_version(conn)
+
+
+def add_exam(project_id: int, name: str, num_questions: int) -> int:
+    """Create an exam without answer key at the end of a project and return its id."""
+    conn = connect()
+    with registry.timed("ocr_db_write_seconds", op="add_exam"), conn:
+        cur = conn.execute(
+            "INSERT INTO exams (project_id, name, num_questions, position) "
+            "SELECT ?, ?, ?, COALESCE(MAX(position), -1) + 1 FROM exams "
+            "WHERE project_id = ?",
+            (project_id, name, num_questions, project_id),
+        )
+        _bump_version(conn)
+        return cur.lastrowid
+
+
+def update_exam(exam_id: int, name: str, num_questions: int) -> None:
+    """Change the name and question count of one exam.
+
+    A new question count changes the histogram, so the statistics are
+    rebuilt here rather than by the next page that shows them.
+    """
+    conn = connect()
+    with registry.timed("ocr_db_write_seconds", op="update_exam"), conn:
+        cur = conn.execute(
+            "UPDATE exams SET name = ?, num_questions = ? "
+            "WHERE id = ? AND num_questions != ?",
+            (name, num_questions, exam_id, num_questions),
+        )
+        if cur.rowcount:
+            rebuild_stats(exam_id, conn)
+        else:
+            conn.execute("UPDATE exams SET name = ? WHERE id = ?", (name, exam_id))
+        _bump_version(conn)
+
+
+def delete_exam(exam_id: int) -> None:
+    """Delete an exam together with its results."""
+    conn = connect()
+    with registry.timed("ocr_db_write_seconds", op="delete_exam"), conn:
+        conn.execute("DELETE FROM exams WHERE id = ?", (exam_id,))
+        _bump_version(conn)
+
+
+def add_results(
+    exam_id: int,
+    results: Iterable[Dict[str, Any]],
+    conn: sqlite3.Connection | None = None,
+) -> List[int]:
+    """Append results to an exam and return the new row ids.
+
+    Runs in its own transaction unless ``conn`` is given by a caller that is
+    already inside one.
+    """
+    results = list(results)
+    rows = [
+        (
+            exam_id,
+            r["filename"],
+            r["score"],
+            json.dumps({k: v for k, v in r.items() if k not in RESULT_COLUMNS})
+            if set(r).difference(RESULT_COLUMNS)
+            else None,
+        )
+        for r in results
+    ]
+    sql = "INSERT INTO results (exam_id, filename, score, extra) VALUES (?, ?, ?, ?)"
+    if conn is not None:
+        ids = [conn.execute(sql, row).lastrowid for row in rows]
+        _update_stats(conn, exam_id, results)
+        return ids
+    conn = connect()
+    with registry.timed("ocr_db_write_seconds", op="add_results"), conn:
+        ids = [conn.execute(sql, row).lastrowid for row in rows]
+        _update_stats(conn, exam_id, results)
+        return ids
+
+
+def get_results(
+    exam_id: int, limit: int | None = None, offset: int = 0
+) -> List[Dict[str, Any]]:
+    """Return the results of one exam in insertion order.
+
+    ``limit`` and ``offset`` select one page of them through the
+    ``(exam_id, id)`` index.
+    """
+    rows = connect().execute(
+        "SELECT * FROM results WHERE exam_id = ? ORDER BY id LIMIT ? OFFSET ?",
+        (exam_id, -1 if limit is None else limit, offset),
+    )
+    return [_result_row(row) for row in rows]
+
+
+def iter_results(exam_ids: List[int]) -> Iterator[tuple[int, Dict[str, Any]]]:
+    """Yield ``(exam_id, result)`` for the given exams, one row at a time.
+
+    Rows come straight from an SQLite cursor, ordered like ``exam_ids`` and
+    by insertion within each exam, so memory use does not grow with the
+    number of results. Uses a connection of its own because the caller may
+    keep the generator open across other queries in the same thread.
+    """
+    conn = sqlite3.connect(get_db_file(), timeout=30)
+    conn.row_factory = sqlite3.Row
+    try:
+        for exam_id in exam_ids:
+            for row in conn.execute(
+                "SELECT * FROM results WHERE exam_id = ? ORDER BY id", (exam_id,)
+            ):
+                yield exam_id, _result_row(row)
+    finally:
+        conn.close()
+
+
+def _stats_basis(conn: sqlite3.Connection, exam_id: int) -> tuple[str, List[str], int]:
+    """Return what an exam's statistics depend on: its key and question count."""
+    row = conn.execute(
+        "SELECT answer_key, num_questions FROM exams WHERE id = ?", (exam_id,)
+    ).fetchone()
+    key = json.loads(row["answer_key"]) if row else []
+    num_questions = row["num_questions"] if row else 0
+    return json.dumps([num_questions, key]), key, num_questions
+
+
+def _update_stats(
+    conn: sqlite3.Connection, exam_id: int, results: List[Dict[str, Any]]
+) -> None:
+    """Fold newly inserted ``results`` into the exam's running statistics."""
+    basis, key, num_questions = _stats_basis(conn, exam_id)
+    row = conn.execute(
+        "SELECT basis, sums FROM exam_stats WHERE exam_id = ?", (exam_id,)
+    ).fetchone()
+    if row is None or row["basis"] != basis:
+        rebuild_stats(exam_id, conn)
+        return
+    answered = [r for r in results if r.get("answers")]
+    sums = stats.accumulate(
+        json.loads(row["sums"]),
+        [r["score"] for r in results],
+        stats.correct_matrix(key, [r["answers"] for r in answered]),
+        [r["score"] for r in answered],
+    )
+    conn.execute(
+        "UPDATE exam_stats SET sums = ? WHERE exam_id = ?", (json.dumps(sums), exam_id)
+    )
+
+
+def rebuild_stats(exam_id: int, conn: sqlite3.Connection | None = None) -> Dict[str, Any]:
+    """Recompute an exam's statistics from all its results and store them.
+
+    Needed after scores were re-graded or the answer key changed; otherwise
+    ``add_results`` keeps them current. Runs in its own transaction unless
+    ``conn`` is given.
+    """
+    if conn is None:
+        conn = connect()
+        with conn:
+            return rebuild_stats(exam_id, conn)
+    basis, key, num_questions = _stats_basis(conn, exam_id)
+    scores: List[int] = []
+    answers: List[str] = []
+    item_scores: List[int] = []
+    for row in conn.execute(
+        "SELECT score, extra FROM results WHERE exam_id = ?", (exam_id,)
+    ):
+        scores.append(row["score"])
+        extra = json.loads(row["extra"]) if row["extra"] else {}
+        if extra.get("answers"):
+            answers.append(extra["answers"])
+            item_scores.append(row["score"])
+    sums = stats.accumulate(
+        stats.empty(num_questions, len(key)),
+        scores,
+        stats.correct_matrix(key, answers),
+        item_scores,
+    )
+    conn.execute(
+        "INSERT INTO exam_stats (exam_id, basis, sums) VALUES (?, ?, ?) "
+        "ON CONFLICT(exam_id) DO UPDATE SET basis = excluded.basis, sums = excluded.sums",
+        (exam_id, basis, json.dumps(sums)),
+    )
+    return sums
+
+
+def get_stats(exam_id: int) -> Dict[str, Any]:
+    """Return the summary of one exam from its precomputed statistics."""
+    return all_stats([exam_id]).get(exam_id, stats.summarize(stats.empty(0)))
+
+
+def all_stats(exam_ids: List[int] | None = None) -> Dict[int, Dict[str, Any]]:
+    """Return ``{exam_id: summary}`` without reading any results.
+
+    Writes that change an exam's answer key or question count rebuild its
+    statistics themselves. Statistics that are still missing or stale, e.g.
+    for databases written by older versions, are rebuilt here once.
+    """
+    conn = connect()
+    sql = (
+        "SELECT e.id, e.num_questions, e.answer_key, s.basis, s.sums "
+        "FROM exams e LEFT JOIN exam_stats s ON s.exam_id = e.id"
+    )
+    params: List[int] = []
+    if exam_ids is not None:
+        sql += f" WHERE e.id IN ({', '.join('?' for _ in exam_ids)})"
+        params = list(exam_ids)
+    summaries: Dict[int, Dict[str, Any]] = {}
+    for row in conn.execute(sql, params).fetchall():
+        basis = json.dumps([row["num_questions"], json.loads(row["answer_key"])])
+        if row["sums"] is None or row["basis"] != basis:
+            sums = rebuild_stats(row["id"])
+        else:
+            sums = json.loads(row["sums"])
+        summaries[row["id"]] = stats.summarize(sums)
+    return summaries
+
+
+def set_answer_key(exam_id: int, answer_key: List[str]) -> None:
+    """Replace the answer key of one exam."""
+    conn = connect()
+    with registry.timed("ocr_db_write_seconds", op="set_answer_key"), conn:
+        conn.execute(
+            "UPDATE exams SET answer_key = ? WHERE id = ?",
+            (json.dumps(answer_key), exam_id),
+        )
+        _bump_version(conn)
+
+
+def issue_codes(exam_id: int, count: int, digits: int) -> List[str]:
+    """Create ``count`` new random student codes of ``digits`` digits.
+
+    Codes are unique within the exam and numbered in the order they were
+    handed out, continuing after earlier downloads.
+    """
+    conn = connect()
+    codes: List[str] = []
+    with registry.timed("ocr_db_write_seconds", op="issue_codes"), conn:
+        row = conn.execute(
+            "SELECT COALESCE(MAX(number), 0) FROM exam_codes WHERE exam_id = ?",
+            (exam_id,),
+        ).fetchone()
+        number = row[0]
+        while len(codes) < count:
+            code = str(secrets.randbelow(10**digits)).zfill(digits)
+            cur = conn.execute(
+                "INSERT OR IGNORE INTO exam_codes (exam_id, code, number) "
+                "VALUES (?, ?, ?)",
+                (exam_id, code, number + 1),
+            )
+            if cur.rowcount:
+                number += 1
+                codes.append(code)
+    return codes
+
+
+def find_codes(exam_id: int, codes: Iterable[str | None]) -> Dict[str, int]:
+    """Return ``{code: number}`` for the given codes issued for an exam.
+
+    Unknown codes and ``None`` are left out. Each code is one lookup in the
+    ``(exam_id, code)`` index.
+    """
+    wanted = sorted({c for c in codes if c})
+    if not wanted:
+        return {}
+    rows = connect().execute(
+        f"SELECT code, number FROM exam_codes WHERE exam_id = ? "
+        f"AND code IN ({', '.join('?' for _ in wanted)})",
+        [exam_id] + wanted,
+    )
+    return {row["code"]: row["number"] for row in rows}
+
+
+def update_scores(scores: Iterable[tuple[int, int]]) -> None:
+    """Set new scores given ``(result_id, score)`` pairs in one transaction."""
+    conn = connect()
+    with registry.timed("ocr_db_write_seconds", op="update_scores"), conn:
+        conn.executemany(
+            "UPDATE results SET score = ? WHERE id = ?",
+            [(score, rid) for rid, score in scores],
+        )
+
 
+if __name__ == "__main__":
+    # python -m ocr_app.data [path/to/data.json]
+    source = sys.argv[1] if len(sys.argv) > 1 else None
+    _conn = sqlite3.connect(get_db_file())
+    _conn.row_factory = sqlite3.Row
+    _conn.execute("PRAGMA foreign_keys=ON")
+    _conn.executescript(SCHEMA)
+    if migrate_json(_conn, source):
+        print(f"Imported {source or get_data_file()} into {get_db_file()}")
+    else:
+        print("Nothing to migrate")
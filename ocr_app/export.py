@@ -0,0 +1,164 @@
+import csv
+import io
+import re
+import zipfile
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Iterator, List
+from xml.sax.saxutils import escape
+
+# rows written before the buffered output is handed to the response
+CHUNK_ROWS = 200
+
+XLSX_CONTENT_TYPE = (
+    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+)
+
+_XLSX_PARTS = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        "</Types>"
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+        "</Relationships>"
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+        "</Relationships>"
+    ),
+}
+
+# characters XML 1.0 does not allow, even escaped
+_INVALID_XML = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+def result_rows(
+    exams: List[Dict[str, Any]],
+    results: Iterable[tuple[int, Dict[str, Any]]],
+    with_exam: bool = False,
+) -> Iterator[List[Any]]:
+    """Yield a header and one row per result for a spreadsheet.
+
+    ``exams`` are the exams the ``(exam_id, result)`` pairs belong to, used
+    for names and question counts; ``results`` is consumed lazily. Answers are
+    only filled in for results stored with them. ``with_exam`` adds the exam
+    name as the first column, for exports spanning several exams.
+    """
+    by_id = {exam["id"]: exam for exam in exams}
+    questions = max((exam["num_questions"] for exam in exams), default=0)
+    header = ["student", "student_code", "filename", "score", "total"]
+    header += [f"Q{q}" for q in range(1, questions + 1)]
+    yield (["exam"] if with_exam else []) + header
+    for exam_id, result in results:
+        exam = by_id[exam_id]
+        answers = [
+            "" if a == "-" else a
+            for a in result.get("answers", "")[: exam["num_questions"]]
+        ]
+        row = [
+            result.get("student", ""),
+            result.get("student_code", ""),
+            result["filename"],
+            result["score"],
+            len(exam["answer_key"]) or exam["num_questions"],
+        ] + answers
+        yield ([exam["name"]] if with_exam else []) + row
+
+
+def iter_csv(rows: Iterable[List[Any]]) -> Iterator[str]:
+    """Encode rows as CSV, yielding a chunk every ``CHUNK_ROWS`` rows."""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    for i, row in enumerate(rows, start=1):
+        writer.writerow(row)
+        if i % CHUNK_ROWS == 1:
+            # the first chunk holds only the header so the download starts at once
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    if buf.tell():
+        yield buf.getvalue()
+
+
+class _Sink:
+    """Write-only file object collecting what ``zipfile`` writes to it.
+
+    Having no ``seek``/``tell`` makes ``ZipFile`` write a streamable archive
+    with data descriptors, so nothing has to be rewritten afterwards.
+    """
+
+    def __init__(self) -> None:
+        self._chunks: List[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def take(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+@lru_cache(maxsize=4096)
+def _cell(value: Any) -> str:
+    # cached: answer letters, blanks and small scores repeat on every row
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return f"<c><v>{value}</v></c>"
+    if value == "":
+        return "<c/>"
+    text = escape(_INVALID_XML.sub("", str(value)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def iter_xlsx(rows: Iterable[List[Any]], sheet_name: str = "Results") -> Iterator[bytes]:
+    """Encode rows as a single-sheet XLSX workbook, streamed as it is zipped.
+
+    Cells use inline strings, so there is no shared string table to build
+    in memory first.
+    """
+    sink = _Sink()
+    with zipfile.ZipFile(sink, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, content in _XLSX_PARTS.items():
+            zf.writestr(name, content)
+        # Excel limits sheet names to 31 characters and forbids []:*?/\
+        title = re.sub(r"[\[\]:*?/\\]", " ", _INVALID_XML.sub("", sheet_name))[:31]
+        title = escape(title.strip() or "Results", {'"': "&quot;"})
+        zf.writestr(
+            "xl/workbook.xml",
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            f'<sheets><sheet name="{title}" sheetId="1" r:id="rId1"/></sheets>'
+            "</workbook>",
+        )
+        yield sink.take()
+        with zf.open("xl/worksheets/sheet1.xml", "w") as sheet:
+            sheet.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                b"<sheetData>"
+            )
+            pending: List[str] = []
+            for row in rows:
+                pending.append("<row>" + "".join(map(_cell, row)) + "</row>")
+                if len(pending) == CHUNK_ROWS:
+                    sheet.write("".join(pending).encode())
+                    pending = []
+                    data = sink.take()
+                    if data:
+                        yield data
+            sheet.write(("".join(pending) + "</sheetData></worksheet>").encode())
+    yield sink.take()
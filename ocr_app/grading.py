@@ -0,0 +1,734 @@
+import io
+import re
+import threading
+import time
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Executor,
+    Future,
+    ProcessPoolExecutor,
+    as_completed,
+    wait,
+)
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Iterable, Iterator, List, Sequence, Sized
+
+from PIL import Image
+import cv2
+import numpy as np
+
+from .cache import content_hash, get_cache
+from .metrics import stage
+from .ocr import get_backend
+from .preprocess import load_sheet
+from .stats import correct_matrix
+
+OPTIONS = "ABCDE"
+# digits of the student code printed as a bubble grid: one row per digit,
+# one column per value 0-9
+CODE_DIGITS = 6
+# bump whenever detection output changes so cached results are not reused
+DETECTOR_VERSION = 4
+# minimum share of dark pixels inside a bubble for it to count as filled
+FILL_THRESHOLD = 0.5
+# tesseract options for the OCR fallback: one uniform block of text made of
+# question numbers and answer letters only
+OCR_CONFIG = "--psm 6 -c tessedit_char_whitelist=0123456789ABCDEabcde"
+
+# closes small gaps in bubble outlines before the contour search
+_CLOSE_KERNEL = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
+
+
+def parse_answers_from_text(text: str, limit: int) -> Dict[int, str]:
+    """Parse OCR text into a mapping of question number to answer letter."""
+    pattern = re.compile(r"(\d+)\s*([ABCDEabcde])")
+    answers: Dict[int, str] = {}
+    for match in pattern.finditer(text):
+        num = int(match.group(1))
+        ans = match.group(2).upper()
+        if 1 <= num <= limit:
+            answers[num] = ans
+    return answers
+
+
+def compare_answers(
+    answer_key: List[str], student_answers: Dict[int, str]
+) -> Dict[int, bool]:
+    results: Dict[int, bool] = {}
+    for i in range(1, len(answer_key) + 1):
+        key = answer_key[i - 1].upper()
+        student = student_answers.get(i, "")
+        results[i] = key == student
+    return results
+
+
+def encode_answers(answers: Dict[int, str], num_questions: int) -> str:
+    """Pack detected answers into a string, one character per question.
+
+    Unanswered questions are stored as ``-``. This is the compact form kept
+    with every stored result so exams can be re-graded without the images.
+    """
+    return "".join(answers.get(i, "-") for i in range(1, num_questions + 1))
+
+
+def regrade_scores(answer_key: List[str], encoded: Sequence[str]) -> np.ndarray:
+    """Score many stored answer strings against ``answer_key`` at once.
+
+    The answers are laid out as a students x questions byte matrix and
+    compared with the key vector in a single NumPy operation.
+    """
+    return correct_matrix(answer_key, encoded).sum(axis=1)
+
+
+def detect_answers_from_bubbles(
+    img: Image.Image, limit: int
+) -> tuple[Dict[int, str], List[Dict[str, float]]]:
+    """Detect filled circles on the standard answer sheet using OpenCV.
+
+    Returns a mapping of question number to the detected answer letter and a
+    list of bounding boxes for each detected circle. Each bounding box is a
+    dictionary with relative percentage coordinates compatible with the result
+    template.
+    """
+    gray = cv2.cvtColor(np.array(img), cv2.COLOR_RGB2GRAY)
+    blur = cv2.GaussianBlur(gray, (5, 5), 0)
+    _, thresh = cv2.threshold(
+        blur, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU
+    )
+    closed = cv2.morphologyEx(thresh, cv2.MORPH_CLOSE, _CLOSE_KERNEL, iterations=2)
+    contours, _ = cv2.findContours(
+        closed, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE
+    )
+
+    circles: List[tuple[int, int, int]] = []
+    for c in contours:
+        area = cv2.contourArea(c)
+        if area < 50:
+            continue
+        (x, y), radius = cv2.minEnclosingCircle(c)
+        if radius < 5 or radius > 30:
+            continue
+        mask = np.zeros_like(gray)
+        cv2.circle(mask, (int(x), int(y)), int(radius), 255, -1)
+        filled_ratio = cv2.mean(thresh, mask=mask)[0] / 255.0
+        if filled_ratio > 0.5:
+            circles.append((int(x), int(y), int(radius)))
+
+    circles.sort(key=lambda t: (t[1], t[0]))
+
+    answers: Dict[int, str] = {}
+    boxes: List[Dict[str, float]] = []
+    row: List[tuple[int, int, int]] = []
+    question = 1
+    row_threshold = 20
+
+    def process_row(r: List[tuple[int, int, int]], q: int) -> None:
+        if not r or q > limit:
+            return
+        r.sort(key=lambda t: t[0])
+        min_x = r[0][0]
+        max_x = r[-1][0]
+        if max_x == min_x:
+            return
+        col_width = (max_x - min_x) / 4.0
+        circ = r[0]
+        idx = int(round((circ[0] - min_x) / col_width))
+        idx = max(0, min(idx, 4))
+        ans = chr(ord("A") + idx)
+        answers[q] = ans
+
+        # bounding box for the detected circle
+        left = max(circ[0] - circ[2], 0)
+        top = max(circ[1] - circ[2], 0)
+        right = min(circ[0] + circ[2], gray.shape[1])
+        bottom = min(circ[1] + circ[2], gray.shape[0])
+        boxes.append(
+            {
+                "num": q,
+                "ans": ans,
+                "left": left / gray.shape[1] * 100,
+                "top": top / gray.shape[0] * 100,
+                "width": (right - left) / gray.shape[1] * 100,
+                "height": (bottom - top) / gray.shape[0] * 100,
+            }
+        )
+
+    for circ in circles:
+        if not row or abs(circ[1] - row[0][1]) < row_threshold:
+            row.append(circ)
+        else:
+            process_row(row, question)
+            question += 1
+            row = [circ]
+
+    process_row(row, question)
+
+    return answers, boxes
+
+
+def _binarize(gray: np.ndarray) -> np.ndarray:
+    blur = cv2.GaussianBlur(gray, (5, 5), 0)
+    _, thresh = cv2.threshold(
+        blur, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU
+    )
+    return thresh
+
+
+def find_bubbles(gray: np.ndarray) -> np.ndarray:
+    """Return ``x, y, radius`` of every round contour on a grayscale sheet.
+
+    Every bubble, filled or empty, shows up as a round external contour once
+    thin outlines are kept by a local threshold.
+    """
+    edges = cv2.adaptiveThreshold(
+        gray, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY_INV, 15, 10
+    )
+    contours, _ = cv2.findContours(
+        edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE
+    )
+    found = []
+    for c in contours:
+        area = cv2.contourArea(c)
+        if area < 20:
+            continue
+        (x, y), radius = cv2.minEnclosingCircle(c)
+        _, _, bw, bh = cv2.boundingRect(c)
+        if area / (np.pi * radius * radius) > 0.8 and 0.8 < bw / bh < 1.25:
+            found.append((x, y, radius))
+    return np.array(found).reshape(-1, 3)
+
+
+def find_bubble_grid(
+    gray: np.ndarray,
+    limit: int,
+    columns: int = len(OPTIONS),
+    bubbles: np.ndarray | None = None,
+) -> Dict[str, Any] | None:
+    """Locate a table of bubbles on a grayscale sheet.
+
+    Rows with exactly ``columns`` bubbles fix the column positions; all rows
+    aligned with those columns become question rows, except rows with
+    clearly more bubbles, which belong to another table such as the student
+    code grid. Returns the column x coordinates, the row y coordinates (at
+    most ``limit``) and the bubble radius, or ``None`` if no table was found.
+    ``bubbles`` from an earlier ``find_bubbles`` call on the same image saves
+    the contour search when several tables are located.
+    """
+    cand = find_bubbles(gray) if bubbles is None else bubbles
+    if len(cand) < columns:
+        return None
+    radius = float(np.median(cand[:, 2]))
+    cand = cand[np.abs(cand[:, 2] - radius) < 0.35 * radius]
+    cand = cand[np.argsort(cand[:, 1])]
+
+    # split into rows wherever the vertical gap exceeds one radius
+    breaks = np.flatnonzero(np.diff(cand[:, 1]) > radius) + 1
+    rows = [r[np.argsort(r[:, 0])] for r in np.split(cand, breaks)]
+    # a table row has evenly spaced bubbles, unlike a line of round glyphs
+    full = [
+        r[:, 0]
+        for r in rows
+        if len(r) == columns
+        and np.std(np.diff(r[:, 0])) < 0.15 * np.mean(np.diff(r[:, 0]))
+    ]
+    if not full:
+        return None
+    xs = np.median(np.array(full), axis=0)
+
+    ys: List[float] = []
+    for r in rows:
+        if len(r) > columns + 2:
+            continue
+        dist = np.abs(r[:, 0][:, None] - xs[None, :]).min(axis=1)
+        aligned = r[dist < radius]
+        if len(aligned) >= columns - 2:
+            ys.append(float(np.median(aligned[:, 1])))
+    if not ys:
+        return None
+    if len(ys) > 2:
+        # re-insert rows whose outlines were lost, keeping question numbers
+        pitch = float(np.median(np.diff(ys)))
+        filled = [ys[0]]
+        for y in ys[1:]:
+            missing = int(round((y - filled[-1]) / pitch)) - 1
+            filled.extend(filled[-1] + pitch * k for k in range(1, missing + 1))
+            filled.append(y)
+        ys = filled
+    return {"xs": xs, "ys": np.array(ys[:limit]), "radius": radius}
+
+
+def score_bubble_grid(thresh: np.ndarray, grid: Dict[str, Any]) -> np.ndarray:
+    """Return the fill ratio of every bubble as a ``rows x columns`` array.
+
+    The dark pixels inside a square inscribed in each bubble are summed from a
+    single integral image, so the cost no longer depends on the number of
+    bubbles times the image size.
+    """
+    h, w = thresh.shape
+    integral = cv2.integral((thresh > 0).astype(np.uint8))
+    half = max(1, int(grid["radius"] * 0.6))
+    xs = np.rint(grid["xs"]).astype(int)[None, :]
+    ys = np.rint(grid["ys"]).astype(int)[:, None]
+    x1 = np.clip(xs - half, 0, w)
+    x2 = np.clip(xs + half + 1, 0, w)
+    y1 = np.clip(ys - half, 0, h)
+    y2 = np.clip(ys + half + 1, 0, h)
+    sums = integral[y2, x2] - integral[y1, x2] - integral[y2, x1] + integral[y1, x1]
+    area = np.maximum((x2 - x1) * (y2 - y1), 1)
+    return sums / area
+
+
+# answer and student code grids found on aligned sheets, keyed by canonical
+# frame size and question count; sheets of one layout share them per worker
+_layout_grids: Dict[tuple, Dict[str, Any]] = {}
+
+
+def grid_fits(gray: np.ndarray, grid: Dict[str, Any]) -> bool:
+    """Return whether every bubble of ``grid`` has an outline on ``gray``.
+
+    Used to check that a grid cached for an aligned layout still matches the
+    sheet at hand before the table search is skipped.
+    """
+    edges = cv2.adaptiveThreshold(
+        gray, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY_INV, 15, 10
+    )
+    ink = score_bubble_grid(edges, dict(grid, radius=grid["radius"] * 1.1 / 0.6))
+    return bool((ink > 0.1).mean() >= 0.9)
+
+
+def read_student_code(gray: np.ndarray, grid: Dict[str, Any] | None) -> str | None:
+    """Decode the student code from its bubble grid.
+
+    Only the area around the grid is thresholded. Every row must have exactly
+    one filled bubble; otherwise the code is unreadable and ``None`` is
+    returned, as it is when the sheet has no code grid.
+    """
+    if grid is None or len(grid["ys"]) != CODE_DIGITS or len(grid["xs"]) != 10:
+        return None
+    pad = int(2 * grid["radius"]) + 1
+    h, w = gray.shape
+    x0 = max(int(grid["xs"][0]) - pad, 0)
+    y0 = max(int(grid["ys"][0]) - pad, 0)
+    x1 = min(int(grid["xs"][-1]) + pad, w)
+    y1 = min(int(grid["ys"][-1]) + pad, h)
+    local = dict(grid, xs=grid["xs"] - x0, ys=grid["ys"] - y0)
+    fill = score_bubble_grid(_binarize(gray[y0:y1, x0:x1]), local)
+    filled = fill >= FILL_THRESHOLD
+    if not (filled.sum(axis=1) == 1).all():
+        return None
+    return "".join(str(d) for d in filled.argmax(axis=1))
+
+
+def detect_answers_from_template(
+    img: Image.Image, limit: int, grid: Dict[str, Any] | None = None
+) -> tuple[Dict[int, str], List[Dict[str, float]], Dict[int, List[float]]]:
+    """Detect answers by sampling every bubble of the answer table at once.
+
+    Returns the answers, the bounding boxes of the chosen bubbles and the
+    darkness score of every option per question. A previously located
+    ``grid`` can be passed in to skip the table search.
+    """
+    gray = np.asarray(img.convert("L"))
+    thresh = _binarize(gray)
+    if grid is None:
+        grid = find_bubble_grid(gray, limit)
+    if grid is None:
+        return {}, [], {}
+    fill = score_bubble_grid(thresh, grid)
+    best = fill.argmax(axis=1)
+    h, w = gray.shape
+    r = grid["radius"]
+
+    answers: Dict[int, str] = {}
+    boxes: List[Dict[str, float]] = []
+    scores: Dict[int, List[float]] = {}
+    for i, (row, choice) in enumerate(zip(fill, best)):
+        q = i + 1
+        scores[q] = [round(float(v), 3) for v in row]
+        if row[choice] < FILL_THRESHOLD:
+            continue
+        ans = OPTIONS[choice]
+        answers[q] = ans
+        x, y = float(grid["xs"][choice]), float(grid["ys"][i])
+        left, top = max(x - r, 0), max(y - r, 0)
+        right, bottom = min(x + r, w), min(y + r, h)
+        boxes.append(
+            {
+                "num": q,
+                "ans": ans,
+                "left": left / w * 100,
+                "top": top / h * 100,
+                "width": (right - left) / w * 100,
+                "height": (bottom - top) / h * 100,
+            }
+        )
+    return answers, boxes, scores
+
+
+def parse_ocr_data(
+    data_dict: Dict[str, List[Any]], size: tuple[int, int], limit: int
+) -> tuple[Dict[int, str], List[Dict[str, Any]]]:
+    """Extract answers and their boxes from tesseract ``image_to_data`` output.
+
+    Accepts ``12 A`` as two words on the same line as well as ``12A`` as one
+    word, matching what ``parse_answers_from_text`` finds in plain text. Box
+    coordinates are percentages of ``size``.
+    """
+    width, height = size
+    texts = data_dict["text"]
+    answers: Dict[int, str] = {}
+    boxes: List[Dict[str, Any]] = []
+
+    def line(i: int) -> tuple:
+        return (data_dict["block_num"][i], data_dict["par_num"][i], data_dict["line_num"][i])
+
+    def add(num: int, ans: str, words: List[int]) -> None:
+        if not 1 <= num <= limit:
+            return
+        left = min(data_dict["left"][w] for w in words)
+        top = min(data_dict["top"][w] for w in words)
+        right = max(data_dict["left"][w] + data_dict["width"][w] for w in words)
+        bottom = max(data_dict["top"][w] + data_dict["height"][w] for w in words)
+        answers[num] = ans
+        boxes.append(
+            {
+                "num": num,
+                "ans": ans,
+                "left": left / width * 100,
+                "top": top / height * 100,
+                "width": (right - left) / width * 100,
+                "height": (bottom - top) / height * 100,
+            }
+        )
+
+    joined = re.compile(r"(\d+)([ABCDEabcde])")
+    i = 0
+    while i < len(texts):
+        word = str(texts[i]).strip()
+        match = joined.fullmatch(word)
+        if match:
+            add(int(match.group(1)), match.group(2).upper(), [i])
+        elif word.isdigit() and i + 1 < len(texts) and line(i) == line(i + 1):
+            nxt = str(texts[i + 1]).strip()
+            if len(nxt) == 1 and nxt.upper() in OPTIONS:
+                add(int(word), nxt.upper(), [i, i + 1])
+                i += 1
+        i += 1
+    return answers, boxes
+
+
+def ocr_answers(
+    img: Image.Image, limit: int, config: str = OCR_CONFIG, backend: str = "auto"
+) -> tuple[Dict[int, str], List[Dict[str, Any]]]:
+    """Read answers and their boxes with a single tesseract pass.
+
+    Used as a fallback when bubble detection found nothing. Coordinates are
+    percentages of the image size, like ``detect_answers_from_bubbles``.
+    ``backend`` names the ``ocr.get_backend`` implementation to use.
+    """
+    data_dict = get_backend(backend).image_to_data(img, config)
+    return parse_ocr_data(data_dict, img.size, limit)
+
+
+def detect_sheet(
+    img: Image.Image,
+    num_questions: int,
+    ocr_backend: str = "auto",
+    timings: Dict[str, float] | None = None,
+    layout: tuple[int, int] | None = None,
+    uncropped: Image.Image | None = None,
+) -> Dict[str, Any]:
+    """Run the detectors in order of cost and return their raw output.
+
+    The template detector is tried first, then the contour detector and
+    finally the OCR fallback. The result is independent of the answer key so
+    it can be cached and scored again later. Time spent in each detector is
+    added to ``timings`` when given. ``layout`` identifies the canonical
+    frame of an aligned sheet; the bubble grids found for it are reused for
+    later sheets of the same layout. ``student_code`` is the code read from
+    the sheet's code grid, if it has a readable one; it is looked for on
+    ``uncropped``, the sheet before it was cropped to the answer table, when
+    ``img`` holds no complete code grid.
+    """
+    method = "template"
+    with stage(timings, "template"):
+        gray = np.asarray(img.convert("L"))
+        grids = _layout_grids.get((layout, num_questions)) if layout else None
+        if grids is not None and not grid_fits(gray, grids["answers"]):
+            grids = None
+        if grids is None:
+            bubbles = find_bubbles(gray)
+            grids = {
+                "answers": find_bubble_grid(gray, num_questions, bubbles=bubbles),
+                "code": find_bubble_grid(gray, CODE_DIGITS, 10, bubbles),
+            }
+            answer_grid = grids["answers"]
+            if layout and answer_grid and len(answer_grid["ys"]) == num_questions:
+                _layout_grids[(layout, num_questions)] = grids
+        if grids["answers"] is None:
+            answers, boxes, scores = {}, [], {}
+        else:
+            answers, boxes, scores = detect_answers_from_template(
+                img, num_questions, grids["answers"]
+            )
+    with stage(timings, "code"):
+        code_gray, code_grid = gray, grids["code"]
+        if uncropped is not None and (
+            code_grid is None or len(code_grid["ys"]) != CODE_DIGITS
+        ):
+            # the crop to the answer table cut the code grid off
+            code_gray = np.asarray(uncropped.convert("L"))
+            code_grid = find_bubble_grid(code_gray, CODE_DIGITS, 10)
+        student_code = read_student_code(code_gray, code_grid)
+    if not answers:
+        method = "contour"
+        with stage(timings, "contour"):
+            answers, boxes = detect_answers_from_bubbles(img.convert("RGB"), num_questions)
+    if not answers:
+        method = "ocr"
+        with stage(timings, "ocr"):
+            answers, boxes = ocr_answers(img, num_questions, backend=ocr_backend)
+    return {
+        "answers": answers,
+        "boxes": boxes,
+        "scores": scores,
+        "method": method,
+        "student_code": student_code,
+    }
+
+
+def grade_sheet(
+    source: str | bytes,
+    answer_key: List[str],
+    num_questions: int,
+    options: Dict[str, Any] | None = None,
+) -> Dict[str, Any]:
+    """Detect and score a single answer sheet image.
+
+    ``source`` is a file path or the encoded image bytes as uploaded, which
+    are decoded in memory without touching the disk. This is the unit of
+    work handed to the batch pool, so it only takes picklable arguments and
+    returns a plain dictionary, including the seconds spent per stage under
+    ``timings``. ``options`` may hold ``preprocess`` (overrides for
+    ``preprocess.load_sheet``), ``ocr_backend`` and
+    ``cache_dir``/``cache_max_bytes`` for the detection cache.
+    """
+    start = time.perf_counter()
+    timings: Dict[str, float] = {}
+    opts = options or {}
+    if isinstance(source, bytes):
+        raw = source
+    else:
+        with stage(timings, "read"), open(source, "rb") as f:
+            raw = f.read()
+
+    cache = key = None
+    if opts.get("cache_dir"):
+        cache = get_cache(opts["cache_dir"], opts.get("cache_max_bytes", 256 * 1024 * 1024))
+        key = cache.key(
+            content_hash(raw),
+            {
+                "version": DETECTOR_VERSION,
+                "num_questions": num_questions,
+                "preprocess": opts.get("preprocess"),
+                "ocr_backend": opts.get("ocr_backend", "auto"),
+                "ocr_config": OCR_CONFIG,
+            },
+        )
+    with stage(timings, "cache"):
+        detected = cache.get(key) if cache is not None else None
+    if detected is not None:
+        # JSON turned the question numbers into strings
+        detected["answers"] = {int(q): a for q, a in detected["answers"].items()}
+        detected["scores"] = {int(q): s for q, s in detected["scores"].items()}
+        cached = True
+    else:
+        with stage(timings, "decode"):
+            sheet = load_sheet(io.BytesIO(raw), opts.get("preprocess"))
+        detected = detect_sheet(
+            sheet.image,
+            num_questions,
+            opts.get("ocr_backend", "auto"),
+            timings,
+            sheet.layout,
+            sheet.uncropped,
+        )
+        detected["boxes"] = sheet.map_boxes(detected["boxes"])
+        if cache is not None:
+            with stage(timings, "cache"):
+                cache.put(key, detected)
+        cached = False
+
+    with stage(timings, "compare"):
+        results = compare_answers(answer_key, detected["answers"])
+    return {
+        "answers": detected["answers"],
+        "results": results,
+        "score": sum(results.values()),
+        "boxes": detected["boxes"],
+        "scores": detected["scores"],
+        "method": detected["method"],
+        "student_code": detected.get("student_code"),
+        "cached": cached,
+        "elapsed": time.perf_counter() - start,
+        "timings": timings,
+    }
+
+
+_pool: ProcessPoolExecutor | None = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def get_pool(workers: int) -> ProcessPoolExecutor:
+    """Return the shared grading pool, replacing it if ``workers`` changed.
+
+    Worker processes are kept alive between requests so each batch does not
+    pay the OpenCV import and process start-up cost again. A pool that broke
+    because a worker died (e.g. killed for memory) is replaced as well. A
+    replaced pool is not shut down here: callers still holding it keep using
+    it, and its workers exit once the last reference to it is gone.
+    """
+    global _pool, _pool_workers
+    with _pool_lock:
+        # _broken is set by the executor once one of its workers died
+        if _pool is None or _pool_workers != workers or _pool._broken:
+            _pool = ProcessPoolExecutor(max_workers=workers)
+            _pool_workers = workers
+        return _pool
+
+
+def grade_in_pool(
+    workers: int,
+    source: str | bytes,
+    answer_key: List[str],
+    num_questions: int,
+    options: Dict[str, Any] | None = None,
+) -> Dict[str, Any]:
+    """Grade one sheet on the shared pool and return its result.
+
+    A pool broken by an earlier sheet is replaced and the sheet tried once
+    more; ``BrokenProcessPool`` is raised if it breaks the new pool as well.
+    """
+    args = (source, answer_key, num_questions, options)
+    try:
+        return get_pool(workers).submit(grade_sheet, *args).result()
+    except BrokenProcessPool:
+        return get_pool(workers).submit(grade_sheet, *args).result()
+
+
+def iter_grade_batch(
+    sources: Sequence[str | bytes],
+    answer_key: List[str],
+    num_questions: int,
+    workers: int = 1,
+    executor: Executor | None = None,
+    options: Dict[str, Any] | None = None,
+) -> Iterator[Dict[str, Any]]:
+    """Grade ``sources`` (paths or image bytes) and yield results in order.
+
+    With ``workers <= 1`` and no ``executor`` the sheets are graded serially in
+    the calling process; otherwise they are spread across a process pool.
+    """
+    if executor is None and (workers <= 1 or len(sources) <= 1):
+        for source in sources:
+            yield grade_sheet(source, answer_key, num_questions, options)
+        return
+    pool = executor or get_pool(workers)
+    n = len(sources)
+    yield from pool.map(
+        grade_sheet, sources, [answer_key] * n, [num_questions] * n, [options] * n
+    )
+
+
+def iter_grade_completed(
+    sources: Iterable[str | bytes],
+    answer_key: List[str],
+    num_questions: int,
+    workers: int = 1,
+    executor: Executor | None = None,
+    options: Dict[str, Any] | None = None,
+    max_pending: int | None = None,
+    return_exceptions: bool = False,
+) -> Iterator[tuple[int, Dict[str, Any] | Exception]]:
+    """Grade ``sources`` and yield ``(index, result)`` as each sheet finishes.
+
+    Unlike ``iter_grade_batch`` a slow sheet does not hold back the results of
+    the sheets after it, which makes this suitable for progress reporting.
+    ``sources`` may be a lazy iterator: at most ``max_pending`` sheets
+    (default twice the worker count) are taken from it and in flight at once.
+    With ``return_exceptions`` the error of a sheet that could not be graded
+    is yielded in place of its result and the remaining sheets still run.
+    """
+
+    def outcome(future: Future) -> Dict[str, Any] | Exception:
+        exc = future.exception()
+        if exc is None:
+            return future.result()
+        if return_exceptions and isinstance(exc, Exception):
+            return exc
+        raise exc
+
+    if executor is None and (
+        workers <= 1 or (isinstance(sources, Sized) and len(sources) <= 1)
+    ):
+        for i, source in enumerate(sources):
+            try:
+                result = grade_sheet(source, answer_key, num_questions, options)
+            except Exception as exc:
+                if not return_exceptions:
+                    raise
+                yield i, exc
+            else:
+                yield i, result
+        return
+    # kept for the whole loop, so a pool replaced meanwhile keeps serving it
+    pool = executor or get_pool(workers)
+    limit = max_pending or 2 * max(workers, 1)
+    pending: Dict[Future, int] = {}
+    for i, source in enumerate(sources):
+        args = (grade_sheet, source, answer_key, num_questions, options)
+        try:
+            future = pool.submit(*args)
+        except BrokenProcessPool:
+            if executor is not None:
+                raise
+            # a worker died; sheets in flight fail, the rest go to a new pool
+            pool = get_pool(workers)
+            future = pool.submit(*args)
+        pending[future] = i
+        if len(pending) < limit:
+            continue
+        finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in finished:
+            yield pending.pop(future), outcome(future)
+    for future in as_completed(pending):
+        yield pending[future], outcome(future)
+
+
+def grade_batch(
+    sources: Sequence[str | bytes],
+    answer_key: List[str],
+    num_questions: int,
+    workers: int = 1,
+    executor: Executor | None = None,
+    options: Dict[str, Any] | None = None,
+) -> List[Dict[str, Any]]:
+    """Grade every sheet in ``sources``, returning results in upload order."""
+    return list(
+        iter_grade_batch(sources, answer_key, num_questions, workers, executor, options)
+    )
+
+
+def warm_up(ocr_backend: str = "auto") -> Dict[str, float]:
+    """Grade a blank page once so the first real sheet does not pay set-up.
+
+    Runs decoding, every detector and the OCR fallback, which loads OpenCV's
+    code paths and the OCR backend and checks that tesseract works. Meant
+    for the master of a preforking server, whose workers and grading pool
+    then inherit it all. Returns the seconds spent per stage; raises
+    ``OSError`` or ``RuntimeError`` when tesseract cannot be run.
+    """
+    buf = io.BytesIO()
+    Image.new("L", (850, 1100), 255).save(buf, "PNG")
+    return grade_sheet(buf.getvalue(), [], 1, {"ocr_backend": ocr_backend})["timings"]
@@ -0,0 +1,188 @@
+import os
+import re
+import shutil
+import subprocess
+import zipfile
+from collections import deque
+from typing import Iterable, Iterator, List
+
+from werkzeug.utils import secure_filename
+
+IMAGE_EXTENSIONS = {"png", "jpg", "jpeg"}
+# uploads holding several sheets, expanded one page or entry at a time
+CONTAINER_EXTENSIONS = {"pdf", "zip"}
+# largest image, or uncompressed ZIP entry, accepted as one sheet
+MAX_SHEET_BYTES = 50 * 1024 * 1024
+
+
+def extension(filename: str) -> str:
+    return filename.rsplit(".", 1)[1].lower() if "." in filename else ""
+
+
+def pdf_backend() -> str | None:
+    """Return ``"pymupdf"`` or ``"pdftoppm"``, whichever can render PDFs here."""
+    try:
+        import fitz  # noqa: F401
+    except ImportError:
+        pass
+    else:
+        return "pymupdf"
+    if shutil.which("pdftoppm") and shutil.which("pdfinfo"):
+        return "pdftoppm"
+    return None
+
+
+class Spooled:
+    """The sheets of an upload spooled to ``path``, produced one at a time.
+
+    The generator behind it deletes the file once it is exhausted; ``close``
+    deletes it in any case, including when iteration never started, which
+    closing an unstarted generator would not.
+    """
+
+    def __init__(self, path: str, pages: Iterator[bytes]) -> None:
+        self.path = path
+        self._pages = pages
+
+    def __iter__(self) -> Iterator[bytes]:
+        return self._pages
+
+    def close(self) -> None:
+        self._pages.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class Sheets:
+    """Iterator over the sheets of several uploads, in upload order.
+
+    Each upload is dropped once its last sheet was taken. ``close`` closes
+    the uploads not finished yet, so spooled files of uploads that were never
+    reached are removed too.
+    """
+
+    def __init__(self, parts: Iterable[Iterable[bytes]]) -> None:
+        self._parts = deque(parts)
+        self._current: Iterator[bytes] | None = None
+
+    def __iter__(self) -> Iterator[bytes]:
+        return self
+
+    def __next__(self) -> bytes:
+        while self._parts:
+            if self._current is None:
+                self._current = iter(self._parts[0])
+            try:
+                return next(self._current)
+            except StopIteration:
+                self._parts.popleft()
+                self._current = None
+        raise StopIteration
+
+    def close(self) -> None:
+        while self._parts:
+            close = getattr(self._parts.popleft(), "close", None)
+            if close is not None:
+                close()
+        self._current = None
+
+
+def expand(
+    path: str, filename: str, dpi: int = 200, max_bytes: int = MAX_SHEET_BYTES
+) -> tuple[List[str], Spooled, List[str]]:
+    """Split the image, PDF or ZIP spooled at ``path`` into sheets.
+
+    Returns the sheet names, which are known up front so progress can be
+    reported, a ``Spooled`` iterable of the encoded image of each sheet and
+    the names of images left out for being larger than ``max_bytes``. The
+    image is read, pages rendered and entries read only as it is advanced,
+    so memory stays bounded by the sheets in flight. ``path`` is deleted once
+    it is exhausted or closed, or right away when it holds no sheets.
+    """
+    stem = secure_filename(filename.rsplit(".", 1)[0]) or "sheet"
+    skipped: List[str] = []
+    if extension(filename) in IMAGE_EXTENSIONS:
+        names = [filename]
+        if os.path.getsize(path) > max_bytes:
+            names, skipped = [], [filename]
+        pages = _image_file(path)
+    elif extension(filename) == "zip":
+        entries: List[str] = []
+        with zipfile.ZipFile(path) as zf:
+            for info in zf.infolist():
+                if info.is_dir() or extension(info.filename) not in IMAGE_EXTENSIONS:
+                    continue
+                # file_size is the uncompressed size, which reading never exceeds
+                if info.file_size > max_bytes:
+                    skipped.append(f"{filename}/{info.filename}")
+                else:
+                    entries.append(info.filename)
+        names = [
+            secure_filename(os.path.basename(e)) or f"{stem}-{i + 1:03d}.png"
+            for i, e in enumerate(entries)
+        ]
+        pages = _zip_entries(path, entries)
+    else:
+        backend = pdf_backend()
+        if backend is None:
+            os.remove(path)
+            raise RuntimeError("PDF uploads need PyMuPDF or poppler's pdftoppm")
+        count = _pdf_page_count(path, backend)
+        names = [f"{stem}-p{i:03d}.png" for i in range(1, count + 1)]
+        pages = _pdf_pages(path, count, dpi, backend)
+    spooled = Spooled(path, pages)
+    if not names:
+        spooled.close()
+    return names, spooled, skipped
+
+
+def _image_file(path: str) -> Iterator[bytes]:
+    try:
+        with open(path, "rb") as f:
+            yield f.read()
+    finally:
+        os.remove(path)
+
+
+def _zip_entries(path: str, entries: List[str]) -> Iterator[bytes]:
+    try:
+        with zipfile.ZipFile(path) as zf:
+            for entry in entries:
+                yield zf.read(entry)
+    finally:
+        os.remove(path)
+
+
+def _pdf_page_count(path: str, backend: str) -> int:
+    if backend == "pymupdf":
+        import fitz
+
+        with fitz.open(path) as doc:
+            return doc.page_count
+    info = subprocess.run(
+        ["pdfinfo", path], check=True, capture_output=True, text=True
+    ).stdout
+    match = re.search(r"^Pages:\s+(\d+)", info, re.MULTILINE)
+    return int(match.group(1)) if match else 0
+
+
+def _pdf_pages(path: str, count: int, dpi: int, backend: str) -> Iterator[bytes]:
+    try:
+        if backend == "pymupdf":
+            import fitz
+
+            with fitz.open(path) as doc:
+                for page in doc:
+                    yield page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY).tobytes("png")
+            return
+        for page in range(1, count + 1):
+            yield subprocess.run(
+                [
+                    "pdftoppm", "-f", str(page), "-l", str(page), "-r", str(dpi),
+                    "-gray", "-png", "-singlefile", path,
+                ],
+                check=True,
+                capture_output=True,
+            ).stdout
+    finally:
+        os.remove(path)
@@ -0,0 +1,207 @@
+import queue
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Iterable, Iterator, List
+
+from .metrics import record_sheet, registry
+
+
+class Job:
+    """State of one uploaded batch that is graded in the background."""
+
+    def __init__(
+        self,
+        filenames: List[str],
+        sources: Iterable[str | bytes],
+        answer_key: List[str],
+        num_questions: int,
+        meta: Dict[str, Any] | None = None,
+        options: Dict[str, Any] | None = None,
+        grading_workers: int = 1,
+    ) -> None:
+        self.id = uuid.uuid4().hex
+        # image paths or bytes, one per filename, possibly produced lazily;
+        # closed, if it has a ``close`` method, and released once the job has
+        # finished
+        self.sources = sources
+        # caller supplied context, e.g. which exam the results belong to
+        self.meta = meta or {}
+        self.answer_key = answer_key
+        self.num_questions = num_questions
+        # passed to ``grading.grade_sheet`` for every sheet of this job
+        self.options = options
+        self.grading_workers = grading_workers
+        self.status = "queued"
+        self.error: str | None = None
+        self.created = time.time()
+        self.finished: float | None = None
+        self.sheets: List[Dict[str, Any]] = [
+            {"filename": name, "status": "pending"} for name in filenames
+        ]
+        # signalled whenever a sheet finishes or the job changes status
+        self._changed = threading.Condition()
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("done", "failed")
+
+    @property
+    def completed(self) -> int:
+        return sum(1 for s in self.sheets if s["status"] in ("done", "failed"))
+
+    def notify(self) -> None:
+        with self._changed:
+            self._changed.notify_all()
+
+    def wait(self, completed: int, timeout: float | None = None) -> None:
+        """Block until more than ``completed`` sheets finished or the job is done."""
+        with self._changed:
+            self._changed.wait_for(
+                lambda: self.done or self.completed > completed, timeout
+            )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON friendly snapshot including the results graded so far."""
+        return {
+            "id": self.id,
+            "status": self.status,
+            "error": self.error,
+            "total": len(self.sheets),
+            "completed": self.completed,
+            "sheets": [dict(s) for s in self.sheets],
+        }
+
+
+class JobQueue:
+    """In-process grading queue served by a few background threads.
+
+    Each job is handed to the shared grading process pool one sheet at a time,
+    so per-sheet progress is visible while the batch is running. No external
+    broker is needed; jobs live in memory of the process that accepted them.
+    """
+
+    def __init__(
+        self,
+        workers: int = 1,
+        max_jobs: int = 100,
+        on_sheet: Callable[[Job, Dict[str, Any]], Dict[str, Any]] | None = None,
+        store: Callable[[bytes, str], str] | None = None,
+    ) -> None:
+        self.workers = workers
+        # keeps uploaded bytes for previews, returning the stored name
+        self.store = store
+        self.max_jobs = max_jobs
+        # stores a graded sheet as soon as it is done and returns the sheet to
+        # publish, so a crash mid-batch keeps everything graded before it
+        self.on_sheet = on_sheet
+        self._jobs: Dict[str, Job] = {}
+        self._queue: "queue.Queue[Job]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+
+    def submit(
+        self,
+        filenames: List[str],
+        sources: Iterable[str | bytes],
+        answer_key: List[str],
+        num_questions: int,
+        meta: Dict[str, Any] | None = None,
+        options: Dict[str, Any] | None = None,
+        grading_workers: int = 1,
+    ) -> Job:
+        job = Job(
+            filenames, sources, answer_key, num_questions, meta, options, grading_workers
+        )
+        with self._lock:
+            self._jobs[job.id] = job
+            self._evict()
+            # threads are started lazily so nothing runs before a fork
+            if not self._threads:
+                for _ in range(self.workers):
+                    t = threading.Thread(target=self._run, daemon=True)
+                    t.start()
+                    self._threads.append(t)
+        self._queue.put(job)
+        return job
+
+    def get(self, job_id: str) -> Job | None:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _evict(self) -> None:
+        """Drop the oldest finished jobs once more than ``max_jobs`` are kept."""
+        if len(self._jobs) <= self.max_jobs:
+            return
+        finished = sorted(
+            (j for j in self._jobs.values() if j.done), key=lambda j: j.created
+        )
+        for job in finished[: len(self._jobs) - self.max_jobs]:
+            del self._jobs[job.id]
+
+    def _run(self) -> None:
+        while True:
+            job = self._queue.get()
+            try:
+                self._process(job)
+            finally:
+                self._queue.task_done()
+
+    def _feed(self, job: Job) -> Iterator[str | bytes]:
+        """Yield the job's sources, storing uploaded bytes as they are taken."""
+        for i, source in enumerate(job.sources):
+            if self.store is not None and isinstance(source, bytes):
+                image = self.store(source, job.sheets[i]["filename"])
+                job.sheets[i] = {**job.sheets[i], "image": image}
+            yield source
+
+    def _process(self, job: Job) -> None:
+        from .grading import iter_grade_completed
+
+        job.status = "running"
+        status = "done"
+        try:
+            for i, result in iter_grade_completed(
+                self._feed(job),
+                job.answer_key,
+                job.num_questions,
+                job.grading_workers,
+                options=job.options,
+                return_exceptions=True,
+            ):
+                if isinstance(result, Exception):
+                    # one unreadable sheet must not cost the rest of the batch
+                    registry.inc("ocr_sheet_errors_total")
+                    job.sheets[i] = {
+                        **job.sheets[i], "status": "failed", "error": str(result)
+                    }
+                else:
+                    record_sheet(result)
+                    sheet = {**job.sheets[i], **result, "status": "done"}
+                    if self.on_sheet is not None:
+                        try:
+                            sheet = self.on_sheet(job, sheet)
+                        except Exception as exc:
+                            sheet = {
+                                **sheet,
+                                "status": "failed",
+                                "error": f"Could not save the result: {exc}",
+                            }
+                    # replace rather than update so readers never see half a result
+                    job.sheets[i] = sheet
+                job.notify()
+        except Exception as exc:  # e.g. a source that could not be read; keep the thread alive
+            registry.inc("ocr_sheet_errors_total")
+            status = "failed"
+            job.error = str(exc)
+            for i, sheet in enumerate(job.sheets):
+                if sheet["status"] != "done":
+                    job.sheets[i] = {**sheet, "status": "failed"}
+        # removes spooled PDF/ZIP uploads, also those never reached
+        close = getattr(job.sources, "close", None)
+        if close is not None:
+            close()
+        job.sources = []
+        job.finished = time.time()
+        job.status = status
+        job.notify()
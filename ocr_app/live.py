@@ -0,0 +1,102 @@
+import threading
+import uuid
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Dict, List
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# frames are checked for registration marks on a copy of this longest side
+CHECK_SIDE = 480
+# mark centres may move this share of the frame diagonal between two frames
+# for the sheet to count as held still
+STABLE_TOLERANCE = 0.01
+# consecutive still frames needed before a sheet is graded
+STABLE_FRAMES = 2
+# a move this large means another sheet was put under the camera
+NEW_SHEET_MOVEMENT = 0.05
+# frames larger than this are rejected; the browser sends ~100 KB JPEGs
+MAX_FRAME_BYTES = 4 * 1024 * 1024
+
+
+class LiveSession:
+    """State of one browser grading sheets held under its camera.
+
+    Keeps the exam and its answer key so frames carry nothing but the image,
+    and follows the registration marks across frames so the full pipeline
+    only runs once per sheet, when it is held still.
+    """
+
+    def __init__(self, exam_id: int, answer_key: List[str], num_questions: int) -> None:
+        self.id = uuid.uuid4().hex
+        self.exam_id = exam_id
+        self.answer_key = answer_key
+        self.num_questions = num_questions
+        # frames of one session are handled one at a time
+        self.lock = threading.Lock()
+        self.marks: np.ndarray | None = None
+        self.stable = 0
+        self.graded = False
+        self.last: Dict[str, Any] | None = None
+
+    def check(self, raw: bytes) -> str:
+        """Track the sheet in an encoded frame without grading it.
+
+        Returns ``"searching"`` when no sheet with all four marks is in view,
+        ``"hold"`` while it moves or has already been graded and ``"ready"``
+        once a new sheet has been still for ``STABLE_FRAMES`` frames.
+        """
+        import cv2
+        import numpy as np
+
+        from .preprocess import find_marks
+
+        buf = np.frombuffer(raw, dtype=np.uint8)
+        gray = cv2.imdecode(buf, cv2.IMREAD_GRAYSCALE)
+        if gray is None:
+            raise ValueError("frame is not an image")
+        scale = min(1.0, CHECK_SIDE / max(gray.shape))
+        if scale < 1:
+            gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        marks = find_marks(gray)
+        if marks is None:
+            self.marks = None
+            self.stable = 0
+            self.graded = False
+            return "searching"
+        # positions as shares of the diagonal, independent of the frame size
+        marks = marks / float(np.hypot(*gray.shape))
+        moved = (
+            float(np.abs(marks - self.marks).max()) if self.marks is not None else 1.0
+        )
+        self.marks = marks
+        if moved > NEW_SHEET_MOVEMENT:
+            self.graded = False
+        self.stable = self.stable + 1 if moved <= STABLE_TOLERANCE else 0
+        if self.graded or self.stable < STABLE_FRAMES:
+            return "hold"
+        return "ready"
+
+
+class LiveSessions:
+    """Live sessions of this process, dropping the least recently used."""
+
+    def __init__(self, max_sessions: int = 100) -> None:
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, LiveSession]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def start(self, exam_id: int, answer_key: List[str], num_questions: int) -> LiveSession:
+        live = LiveSession(exam_id, answer_key, num_questions)
+        with self._lock:
+            self._sessions[live.id] = live
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        return live
+
+    def get(self, live_id: str | None) -> LiveSession | None:
+        with self._lock:
+            live = self._sessions.get(live_id) if live_id else None
+            if live is not None:
+                self._sessions.move_to_end(live_id)
+            return live
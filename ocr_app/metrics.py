@@ -0,0 +1,138 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Tuple
+
+# upper bounds in seconds; covers cached sheets (~1ms) up to slow OCR runs
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Registry:
+    """Process wide counters and histograms rendered in Prometheus text format.
+
+    Recording is a dictionary lookup and a few additions under a lock, cheap
+    enough to stay enabled in production. Every gunicorn worker keeps its own
+    registry; Prometheus adds them up when scraping each worker.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._help: Dict[str, Tuple[str, str]] = {}
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        # name, labels -> (bucket counts, sum, count)
+        self._histograms: Dict[Tuple[str, Labels], Tuple[List[int], float, int]] = {}
+
+    def describe(self, name: str, kind: str, help_text: str) -> None:
+        self._help[name] = (kind, help_text)
+
+    def inc(self, name: str, amount: float = 1, **labels: str) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name: str, seconds: float, **labels: str) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        bucket = bisect_left(BUCKETS, seconds)
+        with self._lock:
+            counts, total, count = self._histograms.get(
+                key, ([0] * (len(BUCKETS) + 1), 0.0, 0)
+            )
+            counts[bucket] += 1
+            self._histograms[key] = (counts, total + seconds, count + 1)
+
+    @contextmanager
+    def timed(self, name: str, **labels: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def render(self) -> str:
+        """Return all metrics in the Prometheus text exposition format."""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(
+                (key, (list(counts), total, count))
+                for key, (counts, total, count) in self._histograms.items()
+            )
+        lines: List[str] = []
+        seen = set()
+
+        def header(name: str) -> None:
+            if name in seen:
+                return
+            seen.add(name)
+            kind, help_text = self._help.get(name, ("untyped", ""))
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in counters:
+            header(name)
+            lines.append(f"{name}{_labels(labels)} {value:g}")
+        for (name, labels), (counts, total, count) in histograms:
+            header(name)
+            cumulative = 0
+            for bound, n in zip(BUCKETS + (float("inf"),), counts):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                lines.append(
+                    f"{name}_bucket{_labels(labels + (('le', le),))} {cumulative}"
+                )
+            lines.append(f"{name}_sum{_labels(labels)} {total:.6f}")
+            lines.append(f"{name}_count{_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    inner = ",".join(
+        '{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"'))
+        for k, v in labels
+    )
+    return "{" + inner + "}"
+
+
+registry = Registry()
+registry.describe("ocr_stage_seconds", "histogram", "Time spent per grading pipeline stage.")
+registry.describe("ocr_sheet_seconds", "histogram", "Time to grade one sheet in a worker.")
+registry.describe("ocr_sheets_graded_total", "counter", "Sheets graded, by detection method.")
+registry.describe("ocr_detection_cache_hits_total", "counter", "Sheets served from the detection cache.")
+registry.describe("ocr_sheet_errors_total", "counter", "Sheets that failed to grade.")
+registry.describe("ocr_http_request_seconds", "histogram", "Request handling time per endpoint.")
+registry.describe("ocr_template_render_seconds", "histogram", "Template rendering time.")
+registry.describe("ocr_db_write_seconds", "histogram", "Time spent in database writes.")
+registry.describe("ocr_warm_up_seconds", "histogram", "Time spent grading a blank page at start-up.")
+
+
+@contextmanager
+def stage(timings: Dict[str, float] | None, name: str) -> Iterator[None]:
+    """Add the time spent in the block to ``timings[name]`` when given.
+
+    Used inside grading workers, which cannot reach the parent's registry;
+    the collected timings travel back with the result and are recorded by
+    ``record_sheet``.
+    """
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = timings.get(name, 0.0) + time.perf_counter() - start
+
+
+def record_sheet(result: Dict) -> None:
+    """Record the timings and outcome of one graded sheet."""
+    for name, seconds in result.get("timings", {}).items():
+        registry.observe("ocr_stage_seconds", seconds, stage=name)
+    if "elapsed" in result:
+        registry.observe("ocr_sheet_seconds", result["elapsed"])
+    registry.inc("ocr_sheets_graded_total", method=result.get("method") or "none")
+    if result.get("cached"):
+        registry.inc("ocr_detection_cache_hits_total")
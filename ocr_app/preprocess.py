@@ -0,0 +1,232 @@
+from typing import Any, Dict, List
+
+from PIL import Image, ImageOps
+import cv2
+import numpy as np
+
+# default preprocessing options, overridable through ``app.config["PREPROCESS"]``
+DEFAULT_OPTIONS: Dict[str, Any] = {
+    # longest side of the working image detection runs on
+    "max_side": 2000,
+    # longest side of the thumbnail used to locate the answer table
+    "locate_side": 800,
+    # crop the working image to the answer table before detection
+    "crop": True,
+    # warp sheets with four corner registration marks to the canonical frame
+    "align": True,
+}
+
+# distance in pixels between the left and right registration marks once
+# aligned; the height follows from the sheet's proportions
+CANONICAL_WIDTH = 800
+# blank border kept around the mark centres in the canonical frame
+CANONICAL_MARGIN = 16
+
+EXIF_ORIENTATION = 0x0112
+
+
+class PreparedSheet:
+    """A downscaled, upright working copy of an uploaded sheet.
+
+    ``image`` is what detection runs on. ``crop`` is its offset and size inside
+    the full working image of ``size``, which has the same aspect ratio as the
+    upright original, so percentages of ``size`` are percentages of the
+    original as displayed by the browser. For sheets aligned on their
+    registration marks ``matrix`` is the homography from the working image to
+    the canonical frame ``image`` is in, and ``crop`` is relative to that
+    frame; ``layout`` then identifies the frame so a bubble grid found once
+    can be reused. ``uncropped`` is the full working image when ``image`` was
+    cropped to the answer table, for reading what lies outside the table.
+    """
+
+    def __init__(
+        self,
+        image: Image.Image,
+        size: tuple[int, int],
+        crop: tuple[int, int, int, int],
+        matrix: np.ndarray | None = None,
+        uncropped: Image.Image | None = None,
+    ) -> None:
+        self.image = image
+        self.size = size
+        self.crop = crop
+        self.matrix = matrix
+        self.uncropped = uncropped
+
+    @property
+    def layout(self) -> tuple[int, int] | None:
+        return self.image.size if self.matrix is not None else None
+
+    def map_boxes(self, boxes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Convert boxes relative to ``image`` into boxes relative to the original."""
+        x, y, w, h = self.crop
+        full_w, full_h = self.size
+        mapped = []
+        for box in boxes:
+            left = x + box["left"] / 100 * w
+            top = y + box["top"] / 100 * h
+            right = left + box["width"] / 100 * w
+            bottom = top + box["height"] / 100 * h
+            if self.matrix is not None:
+                corners = np.array(
+                    [[[left, top], [right, top], [left, bottom], [right, bottom]]],
+                    dtype=np.float64,
+                )
+                pts = cv2.perspectiveTransform(corners, np.linalg.inv(self.matrix))[0]
+                left, top = pts.min(axis=0)
+                right, bottom = pts.max(axis=0)
+            mapped.append(
+                dict(
+                    box,
+                    left=float(left) / full_w * 100,
+                    top=float(top) / full_h * 100,
+                    width=float(right - left) / full_w * 100,
+                    height=float(bottom - top) / full_h * 100,
+                )
+            )
+        return mapped
+
+
+def load_sheet(source: Any, options: Dict[str, Any] | None = None) -> PreparedSheet:
+    """Open ``source`` (a path or file object) and prepare it for detection.
+
+    JPEGs are decoded at a reduced size with ``Image.draft`` when the target
+    allows it, EXIF orientation is applied, the image is converted to
+    grayscale and scaled to ``max_side``. Sheets with registration marks are
+    then warped to the canonical frame; others are optionally cropped to the
+    answer table.
+    """
+    opts = dict(DEFAULT_OPTIONS, **(options or {}))
+    img = Image.open(source)
+    max_side = opts["max_side"]
+    orientation = img.getexif().get(EXIF_ORIENTATION, 1)
+    scale = max_side / max(img.size)
+    if scale < 1:
+        img.draft("L", (int(img.width * scale), int(img.height * scale)))
+    if orientation != 1:
+        img = ImageOps.exif_transpose(img)
+    img = img.convert("L")
+    if max(img.size) > max_side:
+        scale = max_side / max(img.size)
+        img = img.resize(
+            (round(img.width * scale), round(img.height * scale)), Image.BOX
+        )
+    size = img.size
+    if opts["align"]:
+        aligned = align_sheet(np.asarray(img))
+        if aligned is not None:
+            warped, matrix = aligned
+            return PreparedSheet(
+                Image.fromarray(warped),
+                size,
+                (0, 0, warped.shape[1], warped.shape[0]),
+                matrix,
+            )
+    crop = (0, 0, size[0], size[1])
+    uncropped = None
+    if opts["crop"]:
+        box = locate_table(img, opts["locate_side"])
+        if box is not None:
+            crop = box
+            uncropped = img
+            img = img.crop((box[0], box[1], box[0] + box[2], box[1] + box[3]))
+    return PreparedSheet(img, size, crop, uncropped=uncropped)
+
+
+def locate_table(img: Image.Image, locate_side: int) -> tuple[int, int, int, int] | None:
+    """Find the answer table on a thumbnail and return its region in ``img``.
+
+    The region is padded so the question numbers left of the bubbles and a
+    row above and below stay inside, which keeps the OCR fallback working.
+    """
+    from .grading import find_bubble_grid
+
+    scale = min(1.0, locate_side / max(img.size))
+    thumb = img.resize(
+        (round(img.width * scale), round(img.height * scale)), Image.BOX
+    ) if scale < 1 else img
+    grid = find_bubble_grid(np.asarray(thumb), limit=1000)
+    # bubbles only a few pixels wide are not located reliably; skip cropping
+    if grid is None or len(grid["ys"]) < 2 or grid["radius"] < 4:
+        return None
+    pitch_x = float(np.median(np.diff(grid["xs"])))
+    pitch_y = float(np.median(np.diff(grid["ys"])))
+    left = (grid["xs"][0] - 2.5 * pitch_x) / scale
+    right = (grid["xs"][-1] + pitch_x) / scale
+    top = (grid["ys"][0] - 1.5 * pitch_y) / scale
+    # generous below: trailing rows lost on the thumbnail cannot be inferred
+    bottom = (grid["ys"][-1] + 3.5 * pitch_y) / scale
+    left, top = max(int(left), 0), max(int(top), 0)
+    right, bottom = min(int(right), img.width), min(int(bottom), img.height)
+    if right <= left or bottom <= top:
+        return None
+    return left, top, right - left, bottom - top
+
+
+def find_marks(gray: np.ndarray) -> np.ndarray | None:
+    """Return the centres of the four corner registration marks.
+
+    Marks are solid squares; each corner of the image takes the nearest
+    square-shaped blob. The result is ordered top left, top right, bottom
+    right, bottom left, or ``None`` when a corner has no mark.
+    """
+    h, w = gray.shape
+    _, thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    short = min(h, w)
+    found = []
+    for c in contours:
+        area = cv2.contourArea(c)
+        # marks are 0.3in on an 8.5in wide page: roughly 1.5% to 8% of the short side
+        if not (0.015 * short) ** 2 < area < (0.08 * short) ** 2:
+            continue
+        (cx, cy), (rw, rh), _ = cv2.minAreaRect(c)
+        if not rw or not rh or not 0.75 < rw / rh < 1.33:
+            continue
+        # a filled square covers its bounding rectangle, a disc only ~79% of it
+        if area / (rw * rh) < 0.88:
+            continue
+        found.append((cx, cy))
+    if len(found) < 4:
+        return None
+    pts = np.array(found)
+    corners = np.array([[0, 0], [w, 0], [w, h], [0, h]], dtype=np.float64)
+    dist = np.linalg.norm(pts[None, :, :] - corners[:, None, :], axis=2)
+    nearest = dist.argmin(axis=1)
+    if len(set(nearest)) < 4 or (dist.min(axis=1) > 0.25 * np.hypot(w, h)).any():
+        return None
+    return pts[nearest].astype(np.float32)
+
+
+def align_sheet(gray: np.ndarray) -> tuple[np.ndarray, np.ndarray] | None:
+    """Warp a sheet so its registration marks sit at fixed positions.
+
+    Removes rotation, skew and perspective in a single ``warpPerspective``.
+    Returns the canonical image and the homography that produced it, or
+    ``None`` if the marks were not found.
+    """
+    marks = find_marks(gray)
+    if marks is None:
+        return None
+    tl, tr, br, bl = marks
+    across = (np.linalg.norm(tr - tl) + np.linalg.norm(br - bl)) / 2
+    down = (np.linalg.norm(bl - tl) + np.linalg.norm(br - tr)) / 2
+    if across < 0.5 * gray.shape[1] or down < 0.5 * gray.shape[0]:
+        return None
+    width = CANONICAL_WIDTH
+    # round so sheets of one layout land on the same frame size
+    height = int(round(width * down / across / 8)) * 8
+    m = CANONICAL_MARGIN
+    target = np.array(
+        [[m, m], [m + width, m], [m + width, m + height], [m, m + height]],
+        dtype=np.float32,
+    )
+    matrix = cv2.getPerspectiveTransform(marks, target)
+    warped = cv2.warpPerspective(
+        gray,
+        matrix,
+        (width + 2 * m, height + 2 * m),
+        flags=cv2.INTER_AREA,
+        borderValue=255,
+    )
+    return warped, matrix
@@ -0,0 +1,122 @@
+import hashlib
+import os
+import shutil
+import subprocess
+import tempfile
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List
+
+from flask import render_template
+
+# scaled points per TeX point, the unit of \pdflastxpos / \pdflastypos
+SP_PER_PT = 65536
+# diameter in points of the discs stamped into the student code bubbles
+CODE_MARK_PT = 11
+
+
+@contextmanager
+def build_dir(parent: str) -> Iterator[str]:
+    """Yield a private directory under ``parent`` and remove it afterwards."""
+    os.makedirs(parent, exist_ok=True)
+    path = tempfile.mkdtemp(dir=parent)
+    try:
+        yield path
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def run_pdflatex(tex: str, directory: str, name: str = "sheet") -> str:
+    """Compile ``tex`` inside ``directory`` and return the path of the PDF.
+
+    Raises ``FileNotFoundError`` when ``pdflatex`` is missing and
+    ``subprocess.CalledProcessError`` when compilation fails.
+    """
+    tex_path = os.path.join(directory, f"{name}.tex")
+    with open(tex_path, "w") as f:
+        f.write(tex)
+    subprocess.run(
+        ["pdflatex", "-interaction=nonstopmode", "-output-directory", directory, tex_path],
+        check=True,
+        cwd=directory,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    pdf_path = os.path.join(directory, f"{name}.pdf")
+    if not os.path.exists(pdf_path):
+        raise FileNotFoundError(pdf_path)
+    return pdf_path
+
+
+def base_sheet(exam_name: str, num_questions: int, cache_dir: str) -> tuple[str, Dict[str, Any]]:
+    """Return the cached single-sheet PDF and where its student code goes.
+
+    The layout is compiled once per rendered template, so it is rebuilt when
+    the exam name, the number of questions or the template itself changes.
+    The positions are in points from the lower left corner of page one:
+    ``code`` for the printed code and ``bubbles[(digit, value)]`` for the
+    centre of every bubble of the code grid.
+    """
+    from .grading import CODE_DIGITS
+
+    tex = render_template(
+        "answer_sheet.tex",
+        exam_name=exam_name,
+        num_questions=num_questions,
+        code_digits=CODE_DIGITS,
+    )
+    digest = hashlib.sha256(tex.encode()).hexdigest()[:16]
+    pdf_path = os.path.join(cache_dir, f"{digest}.pdf")
+    pos_path = os.path.join(cache_dir, f"{digest}.pos")
+    if not os.path.exists(pdf_path):
+        with build_dir(cache_dir) as tmp:
+            built = run_pdflatex(tex, tmp)
+            # the PDF is what readers check for, so move it into place last
+            os.replace(os.path.join(tmp, "sheet.pos"), pos_path)
+            os.replace(built, pdf_path)
+    positions: Dict[str, Any] = {"bubbles": {}}
+    with open(pos_path) as f:
+        for line in f:
+            values = [int(v) for v in line.strip().split(",")]
+            x, y = values[-2] / SP_PER_PT, values[-1] / SP_PER_PT
+            if len(values) == 2:
+                positions["code"] = (x, y)
+            else:
+                positions["bubbles"][values[0], values[1]] = (x, y)
+    return pdf_path, positions
+
+
+def class_set(
+    exam_name: str, num_questions: int, codes: List[str], cache_dir: str
+) -> bytes:
+    """Return a PDF with one answer sheet per entry in ``codes``.
+
+    The cached base sheet is included once per student with its code stamped
+    on top, both as text and as filled bubbles in the code grid, which is a
+    quick ``pdfpages`` run instead of typesetting every answer table again.
+    Each call builds in its own directory, so concurrent downloads never
+    share files.
+    """
+    base, positions = base_sheet(exam_name, num_questions, cache_dir)
+    x, y = positions["code"]
+    copies = [
+        {
+            "code": code,
+            "marks": [
+                "{:.2f},{:.2f}".format(*positions["bubbles"][i, int(d)])
+                for i, d in enumerate(code)
+            ],
+        }
+        for code in codes
+    ]
+    tex = render_template(
+        "answer_sheet_set.tex",
+        base="base.pdf",
+        x=f"{x:.2f}",
+        y=f"{y:.2f}",
+        copies=copies,
+        mark=CODE_MARK_PT,
+    )
+    with build_dir(cache_dir) as tmp:
+        shutil.copyfile(base, os.path.join(tmp, "base.pdf"))
+        with open(run_pdflatex(tex, tmp), "rb") as f:
+            return f.read()
@@ -0,0 +1,123 @@
+import math
+from typing import TYPE_CHECKING, Any, Dict, List, Sequence
+
+if TYPE_CHECKING:
+    import numpy as np
+
+
+def correct_matrix(answer_key: Sequence[str], encoded: Sequence[str]) -> "np.ndarray":
+    """Return a students x questions boolean matrix of correct answers.
+
+    ``encoded`` holds answer strings as produced by ``grading.encode_answers``;
+    they are laid out as a byte matrix and compared with the key in one
+    NumPy operation.
+    """
+    import numpy as np
+
+    n = len(answer_key)
+    if not encoded or not n:
+        return np.zeros((len(encoded), n), dtype=bool)
+    key = np.frombuffer("".join(answer_key).upper().encode("ascii"), dtype=np.uint8)
+    rows = "".join(a[:n].ljust(n, "-") for a in encoded).encode("ascii")
+    matrix = np.frombuffer(rows, dtype=np.uint8).reshape(len(encoded), n)
+    return matrix == key
+
+
+def empty(num_questions: int, num_items: int | None = None) -> Dict[str, Any]:
+    """Return zeroed running sums for an exam with ``num_questions``.
+
+    ``count``/``score_sum``/``score_sq_sum``/``histogram`` cover every result;
+    the ``item_*`` sums and per-question counts (``num_items``, the length of
+    the answer key) only cover results stored with their answers, since item
+    statistics need them.
+    """
+    num_items = num_questions if num_items is None else num_items
+    return {
+        "count": 0,
+        "score_sum": 0,
+        "score_sq_sum": 0,
+        "histogram": [0] * (num_questions + 1),
+        "item_count": 0,
+        "item_score_sum": 0,
+        "item_score_sq_sum": 0,
+        # per question: students answering correctly, and the sum of their scores
+        "correct": [0] * num_items,
+        "correct_score_sum": [0] * num_items,
+    }
+
+
+def accumulate(
+    sums: Dict[str, Any],
+    scores: Sequence[int],
+    correct: "np.ndarray",
+    item_scores: Sequence[int],
+) -> Dict[str, Any]:
+    """Add a batch of results to ``sums`` in place and return it.
+
+    ``scores`` are the scores of all new results; ``correct`` is the
+    ``correct_matrix`` of those stored with answers and ``item_scores`` their
+    scores, in the same order.
+    """
+    import numpy as np
+
+    s = np.asarray(scores, dtype=np.int64)
+    hist = sums["histogram"]
+    counts = np.bincount(np.clip(s, 0, len(hist) - 1), minlength=len(hist))
+    sums["histogram"] = [int(a + b) for a, b in zip(hist, counts)]
+    sums["count"] += int(s.size)
+    sums["score_sum"] += int(s.sum())
+    sums["score_sq_sum"] += int((s * s).sum())
+    if len(item_scores) and correct.shape[1] == len(sums["correct"]):
+        t = np.asarray(item_scores, dtype=np.int64)
+        sums["item_count"] += int(t.size)
+        sums["item_score_sum"] += int(t.sum())
+        sums["item_score_sq_sum"] += int((t * t).sum())
+        sums["correct"] = [
+            int(a + b) for a, b in zip(sums["correct"], correct.sum(axis=0))
+        ]
+        sums["correct_score_sum"] = [
+            int(a + b) for a, b in zip(sums["correct_score_sum"], t @ correct)
+        ]
+    return sums
+
+
+def summarize(sums: Dict[str, Any]) -> Dict[str, Any]:
+    """Turn running sums into the figures shown on the dashboard.
+
+    ``difficulty`` is the share of students answering each question correctly
+    and ``discrimination`` its point-biserial correlation with the total score
+    (``None`` when undefined, e.g. everyone answered alike).
+    """
+    n = sums["count"]
+    mean = sums["score_sum"] / n if n else 0.0
+    variance = sums["score_sq_sum"] / n - mean * mean if n else 0.0
+    summary: Dict[str, Any] = {
+        "count": n,
+        "mean": mean,
+        "sd": math.sqrt(max(variance, 0.0)),
+        "histogram": sums["histogram"],
+        "item_count": sums["item_count"],
+        "difficulty": [],
+        "discrimination": [],
+    }
+    m = sums["item_count"]
+    if not m:
+        return summary
+    item_mean = sums["item_score_sum"] / m
+    item_sd = math.sqrt(max(sums["item_score_sq_sum"] / m - item_mean * item_mean, 0.0))
+    difficulty: List[float] = []
+    discrimination: List[float | None] = []
+    for c, total in zip(sums["correct"], sums["correct_score_sum"]):
+        p = c / m
+        difficulty.append(p)
+        if c == 0 or c == m or item_sd == 0:
+            discrimination.append(None)
+            continue
+        mean_correct = total / c
+        mean_wrong = (sums["item_score_sum"] - total) / (m - c)
+        discrimination.append(
+            (mean_correct - mean_wrong) / item_sd * math.sqrt(p * (1 - p))
+        )
+    summary["difficulty"] = difficulty
+    summary["discrimination"] = discrimination
+    return summary
@@ -0,0 +1,137 @@
+import io
+import os
+import re
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict
+
+from werkzeug.security import safe_join
+
+from .cache import content_hash
+
+# preview sizes by name, as the longest side in pixels
+PREVIEW_SIZES = {"thumb": 320, "preview": 1200}
+# file extension per preview format
+PREVIEW_FORMATS = {"webp": "webp", "jpeg": "jpg"}
+PREVIEW_QUALITY = 80
+# names given by ``UploadStore.name``; older uploads kept their client names
+HASH_NAME = re.compile(r"^[0-9a-f]{64}\.\w+$")
+
+
+class UploadStore:
+    """Content-addressed store of uploaded originals, written in the background.
+
+    Files are named after the SHA-256 of their content, so sheets with the
+    same client file name never overwrite each other and re-uploads of the
+    same scan are stored once. Grading works on the bytes in memory; the
+    disk write only serves previews and happens on a background thread.
+    Until it has finished, ``pending`` returns the bytes instead.
+    """
+
+    def __init__(self, directory: str, workers: int = 1) -> None:
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._pending: Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+        # threads are only started by the first submit, so nothing runs before a fork
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+
+    @staticmethod
+    def name(data: bytes, filename: str) -> str:
+        """Return the stored name for ``data`` uploaded as ``filename``."""
+        ext = filename.rsplit(".", 1)[1].lower() if "." in filename else "bin"
+        return f"{content_hash(data)}.{ext}"
+
+    def save(self, data: bytes, filename: str) -> str:
+        """Schedule ``data`` to be written and return its stored name."""
+        name = self.name(data, filename)
+        with self._lock:
+            if name in self._pending or os.path.exists(self.path(name)):
+                return name
+            self._pending[name] = data
+        self._executor.submit(self._write, name, data)
+        return name
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def read(self, name: str) -> bytes | None:
+        """Return the stored bytes of ``name``, or ``None`` if it is unknown."""
+        data = self.pending(name)
+        if data is not None:
+            return data
+        path = safe_join(self.directory, name)
+        if path is None or not os.path.isfile(path):
+            return None
+        with open(path, "rb") as f:
+            return f.read()
+
+    def preview(self, name: str, size: str, fmt: str) -> str | None:
+        """Return the path of a downscaled copy of ``name``, creating it once.
+
+        Previews are stored under ``previews/`` named after the content hash,
+        the size and the format, so each is encoded only once per upload.
+        ``None`` means the upload does not exist or cannot be decoded.
+        """
+        directory = os.path.join(self.directory, "previews")
+        key = name.rsplit(".", 1)[0] if HASH_NAME.match(name) else None
+        if key is not None:
+            path = os.path.join(directory, f"{key}-{size}.{PREVIEW_FORMATS[fmt]}")
+            if os.path.exists(path):
+                return path
+        data = self.read(name)
+        if data is None:
+            return None
+        if key is None:
+            key = content_hash(data)
+            path = os.path.join(directory, f"{key}-{size}.{PREVIEW_FORMATS[fmt]}")
+            if os.path.exists(path):
+                return path
+        from PIL import Image
+
+        try:
+            encoded = render_preview(data, PREVIEW_SIZES[size], fmt)
+        except (OSError, ValueError, Image.DecompressionBombError):
+            return None
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(encoded)
+        os.replace(tmp, path)
+        return path
+
+    def pending(self, name: str) -> bytes | None:
+        """Return the bytes of ``name`` if they are not on disk yet."""
+        with self._lock:
+            return self._pending.get(name)
+
+    def _write(self, name: str, data: bytes) -> None:
+        try:
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, self.path(name))
+        finally:
+            with self._lock:
+                self._pending.pop(name, None)
+
+
+def render_preview(data: bytes, side: int, fmt: str) -> bytes:
+    """Encode ``data`` as an upright image no larger than ``side`` pixels.
+
+    EXIF orientation is applied so the preview matches the original as shown
+    by the browser and percentage based box overlays stay aligned.
+    """
+    from PIL import Image, ImageOps
+
+    img = Image.open(io.BytesIO(data))
+    # let the JPEG decoder skip detail the preview does not need
+    img.draft("RGB", (side, side))
+    img = ImageOps.exif_transpose(img)
+    if img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+    img.thumbnail((side, side), Image.LANCZOS)
+    buf = io.BytesIO()
+    img.save(buf, fmt.upper(), quality=PREVIEW_QUALITY)
+    return buf.getvalue()